@@ -0,0 +1,210 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from database import EXPORT_TABLES, Database
+
+# 내보내기 형식 ('jsonl': 하나의 gzip 압축 JSON Lines 파일, 'parquet': 테이블별 Parquet 파일 디렉터리)
+FORMATS = ('jsonl', 'parquet')
+# SQLite 선언 타입별 Parquet 타입 (BOOLEAN도 0/1 정수로 저장되어 있으므로 정수로 유지)
+PARQUET_TYPES = {'INTEGER': 'int64', 'REAL': 'float64', 'TEXT': 'string', 'BOOLEAN': 'int64'}
+
+
+def _stats(tables, started):
+    elapsed = time.perf_counter() - started
+    rows = sum(tables.values())
+    return {
+        'tables': tables,
+        'rows': rows,
+        'elapsed_s': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet format requires pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def export_data(db, path, format='jsonl', chunk_size=10000, tables=EXPORT_TABLES):
+    """테이블을 청크 단위로 읽어 path에 스트리밍으로 내보내고 통계를 반환하는 함수
+
+    jsonl 파일은 첫 줄에 스키마 버전, 테이블마다 컬럼 줄과 행 줄이 이어집니다.
+    parquet은 path 디렉터리에 <테이블>.parquet을 청크마다 행 그룹으로 추가합니다.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+
+    started = time.perf_counter()
+    counts = dict.fromkeys(tables, 0)
+    if format == 'jsonl':
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(json.dumps({'schema_version': db.schema_version(), 'tables': list(tables)}) + '\n')
+            current = None
+            for table, columns, rows in db.export_tables(tables, chunk_size):
+                if table != current:
+                    f.write(json.dumps({'table': table, 'columns': columns}, ensure_ascii=False) + '\n')
+                    current = table
+                f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+                counts[table] += len(rows)
+        return _stats(counts, started)
+
+    pa, pq = _require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    writer = None
+    current = None
+    try:
+        for table, columns, rows in db.export_tables(tables, chunk_size):
+            if table != current:
+                if writer is not None:
+                    writer.close()
+                types = dict(db.table_schema(table))
+                schema = pa.schema([(name, PARQUET_TYPES.get(types.get(name), 'string')) for name in columns])
+                writer = pq.ParquetWriter(os.path.join(path, f'{table}.parquet'), schema, compression='zstd')
+                current = table
+            writer.write_table(pa.Table.from_pydict(
+                {name: list(values) for name, values in zip(columns, zip(*rows))}, schema=schema
+            ))
+            counts[table] += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return _stats(counts, started)
+
+
+def _read_jsonl(path, batch_size):
+    # (테이블, 컬럼 목록, 행 목록)을 batch_size 행씩 읽는 제너레이터
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        json.loads(f.readline())
+        table = columns = None
+        rows = []
+        for line in f:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                if rows:
+                    yield table, columns, rows
+                    rows = []
+                table, columns = record['table'], record['columns']
+                continue
+            rows.append(record)
+            if len(rows) >= batch_size:
+                yield table, columns, rows
+                rows = []
+        if rows:
+            yield table, columns, rows
+
+
+def _read_parquet(path, batch_size, tables):
+    pa, pq = _require_pyarrow()
+    for table in tables:
+        filename = os.path.join(path, f'{table}.parquet')
+        if not os.path.exists(filename):
+            continue
+        parquet = pq.ParquetFile(filename)
+        for batch in parquet.iter_batches(batch_size=batch_size):
+            yield table, tuple(batch.schema.names), list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+def import_data(db, path, format='jsonl', batch_size=50000, tables=EXPORT_TABLES, progress=None):
+    """export_data로 내보낸 파일을 batch_size 행씩 한 트랜잭션으로 가져오고 통계를 반환하는 함수
+
+    기존 ID를 그대로 저장하므로 빈 데이터베이스로 가져오는 것을 전제로 하며,
+    가져오는 동안에는 보조 인덱스가 없으므로 앱을 연결하지 않은 상태에서 실행합니다.
+    progress(stats)는 트랜잭션마다 호출됩니다.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+
+    started = time.perf_counter()
+    counts = dict.fromkeys(tables, 0)
+    batches = _read_jsonl(path, batch_size) if format == 'jsonl' else _read_parquet(path, batch_size, tables)
+    # 행마다 인덱스를 갱신하지 않고 가져오기가 끝난 뒤 한 번에 만듦
+    with db.deferred_indexes(tables):
+        for table, columns, rows in batches:
+            if table not in counts:
+                continue
+            counts[table] += db.import_rows(table, columns, rows)
+            if progress is not None:
+                progress(_stats(counts, started))
+    return _stats(counts, started)
+
+
+def backup_database(db, dest_path, pages=-1):
+    """온라인 백업 후 (복사한 페이지 수, 걸린 시간) 통계를 반환하는 함수"""
+    started = time.perf_counter()
+    copied = {'pages': 0}
+
+    def progress(status, remaining, total):
+        copied['pages'] = total - remaining
+
+    db.backup(dest_path, pages=pages, progress=progress)
+    elapsed = time.perf_counter() - started
+    return {'pages': copied['pages'], 'bytes': os.path.getsize(dest_path), 'elapsed_s': elapsed}
+
+
+def restore_database(backup_path, db_path, pages=-1):
+    """백업 파일을 db_path로 복원하는 함수 (앱과 작업을 멈춘 상태에서 실행)"""
+    source = sqlite3.connect(backup_path)
+    target = sqlite3.connect(db_path)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="데이터베이스 내보내기/가져오기/백업/복원")
+    parser.add_argument('--db', default='scoliosis.db', help="데이터베이스 경로")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="테이블을 압축 파일로 내보내기")
+    export_parser.add_argument('path', help="jsonl: 파일 경로 (.jsonl.gz), parquet: 디렉터리 경로")
+    export_parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    export_parser.add_argument('--chunk-size', type=int, default=10000, help="한 번에 읽을 행 수")
+
+    import_parser = commands.add_parser('import', help="내보낸 파일을 빈 데이터베이스로 가져오기")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    import_parser.add_argument('--batch-size', type=int, default=50000, help="한 트랜잭션에 저장할 행 수")
+
+    backup_parser = commands.add_parser('backup', help="온라인 백업 (쓰기를 막지 않음)")
+    backup_parser.add_argument('path', help="백업 파일 경로")
+    backup_parser.add_argument('--pages', type=int, default=-1,
+                               help="한 단계에 복사할 페이지 수 (기본값: 한 번에 전체, 쓰기가 잦으면 나누지 않음)")
+
+    restore_parser = commands.add_parser('restore', help="백업 파일을 --db 경로로 복원")
+    restore_parser.add_argument('path', help="백업 파일 경로")
+    args = parser.parse_args(argv)
+
+    if args.command == 'restore':
+        restore_database(args.path, args.db)
+        print(f"{args.path} -> {args.db} 복원 완료")
+        return
+
+    def report(stats):
+        print(f"{stats['rows']}행, {stats['rows_per_sec']:.0f} rows/sec", file=sys.stderr)
+
+    with Database(args.db) as db:
+        if args.command == 'backup':
+            stats = backup_database(db, args.path, pages=args.pages)
+            print(f"{stats['pages']}페이지 ({stats['bytes'] / 1e6:.1f}MB), {stats['elapsed_s']:.2f}초")
+            return
+        if args.command == 'export':
+            stats = export_data(db, args.path, args.format, chunk_size=args.chunk_size)
+        else:
+            stats = import_data(db, args.path, args.format, batch_size=args.batch_size, progress=report)
+        tables = ', '.join(f"{table} {count}" for table, count in stats['tables'].items())
+        print(f"{tables}: {stats['rows']}행, {stats['elapsed_s']:.2f}초 ({stats['rows_per_sec']:.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+from database import Database
+from image_processor import ANALYZERS, ImageProcessor, SEARCH_MODES, list_images
+from image_store import ImageStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="아담스 테스트 / 자세 체크 일괄 분석")
+    parser.add_argument('paths', nargs='+', help="이미지 파일 또는 디렉터리")
+    parser.add_argument('--kind', choices=list(ANALYZERS), default='adams_test', help="분석 종류")
+    parser.add_argument('--user-id', type=int, help="결과를 저장할 사용자 ID (없으면 저장하지 않음)")
+    parser.add_argument('--db', default='scoliosis.db', help="데이터베이스 경로")
+    parser.add_argument('--workers', type=int, default=None, help="워커 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument('--max-dimension', type=int, default=1024, help="작업 해상도 (긴 변 기준 픽셀)")
+    parser.add_argument('--search-mode', choices=SEARCH_MODES, default='full',
+                        help="윤곽선 탐색 방식 (roi: 축소 이미지에서 몸통 영역을 찾은 뒤 영역만 분석)")
+    parser.add_argument('--quality-gate', action='store_true',
+                        help="분석 전에 흐리거나 어둡거나 피사체가 없는 사진을 거부")
+    parser.add_argument('--image-root', default='images', help="결과 저장 시 이미지를 보관할 저장소 경로")
+    args = parser.parse_args(argv)
+
+    # 디렉터리는 포함된 이미지 파일 목록으로 펼침
+    images = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            images.extend(list_images(path))
+        else:
+            images.append(path)
+
+    processor = ImageProcessor(max_dimension=args.max_dimension, search_mode=args.search_mode,
+                               quality_gate=args.quality_gate)
+    # 결과를 저장할 때만 재분석할 수 있도록 원본을 저장소에 보관 (저장은 워커에서 분석과 함께 수행)
+    store = ImageStore(args.image_root, max_dimension=args.max_dimension) if args.user_id is not None else None
+    started = time.perf_counter()
+    results = processor.process_batch(images, kind=args.kind, workers=args.workers, image_store=store)
+    elapsed = time.perf_counter() - started
+
+    failed = 0
+    records = []
+    for item in results:
+        if item['error']:
+            failed += 1
+            print(f"{item['image']}\tERROR\t{item['error']}")
+            continue
+        print(f"{item['image']}\t{item['score']:.4f}")
+        if args.user_id is not None:
+            records.append((args.user_id, args.kind, item['score'], item['content_hash']))
+
+    if records:
+        with Database(args.db) as db:
+            db.add_diagnoses(records)
+
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"{len(results)}개 분석, {failed}개 실패, {elapsed:.2f}초 ({rate:.1f} images/sec)", file=sys.stderr)
+    return 1 if failed and failed == len(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from datetime import date, timedelta
+
+from database import Database
+from image_processor import ANALYZERS, ImageProcessor
+
+
+def _timeit(func, repeat):
+    """func를 repeat번 실행하여 가장 빠른 실행 시간(초)을 반환"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _legacy_curvature(points):
+    """벡터화 이전의 파이썬 루프 구현 (비교용)"""
+    if len(points) < 3:
+        return 0
+    points = sorted(points, key=lambda p: p[0][1])
+    max_angle = 0
+    for i in range(len(points) - 2):
+        p1 = points[i][0]
+        p2 = points[i + 1][0]
+        p3 = points[i + 2][0]
+        v1 = np.array([p2[0] - p1[0], p2[1] - p1[1]])
+        v2 = np.array([p3[0] - p2[0], p3[1] - p2[1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+        angle = np.arccos(np.clip(cos_angle, -1.0, 1.0)) * 180 / np.pi
+        max_angle = max(max_angle, angle)
+    return max_angle / 40.0
+
+
+def _dense_contours(size, count=1):
+    """CHAIN_APPROX_NONE으로 추출한 조밀한 합성 윤곽선"""
+    image = np.zeros((size, size), np.uint8)
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        center = (int(rng.integers(size // 4, 3 * size // 4)), int(rng.integers(size // 4, 3 * size // 4)))
+        axes = (int(rng.integers(size // 16, size // 4)), int(rng.integers(size // 16, size // 3)))
+        cv2.ellipse(image, center, axes, float(rng.integers(0, 180)), 0, 360, 255, 2 if count > 1 else -1)
+    contours, _ = cv2.findContours(image, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    return contours
+
+
+def bench_curvature(repeat=5):
+    """_calculate_curvature의 벡터화 구현과 기존 루프 구현 비교"""
+    processor = ImageProcessor()
+    results = {}
+    for size in (512, 1024, 2048):
+        contour = max(_dense_contours(size), key=cv2.contourArea)
+        legacy = _timeit(lambda: _legacy_curvature(contour), repeat)
+        vectorized = _timeit(lambda: processor._calculate_curvature(contour), repeat)
+        assert abs(_legacy_curvature(contour) - processor._calculate_curvature(contour)) < 1e-9
+        results[f"single_{len(contour)}pts"] = {
+            'legacy_s': legacy,
+            'vectorized_s': vectorized,
+            'speedup': legacy / vectorized
+        }
+
+    contours = _dense_contours(1024, count=50)
+    legacy = _timeit(lambda: [_legacy_curvature(c) for c in contours], repeat)
+    looped = _timeit(lambda: [processor._calculate_curvature(c) for c in contours], repeat)
+    batched = _timeit(lambda: processor.calculate_curvatures(contours), repeat)
+    assert np.allclose(processor.calculate_curvatures(contours),
+                       [_legacy_curvature(c) for c in contours])
+    results[f"batch_{len(contours)}contours"] = {
+        'legacy_s': legacy,
+        'vectorized_s': looped,
+        'batched_s': batched,
+        'speedup': legacy / batched
+    }
+    return results
+
+
+# 대시보드/리포트 쿼리와 반드시 사용해야 하는 인덱스
+QUERY_PLAN_CHECKS = (
+    ('user_diagnoses',
+     'SELECT * FROM diagnoses WHERE user_id = ? ORDER BY diagnoses.created_at DESC', (1,),
+     'idx_diagnoses_user_created'),
+    ('user_exercises',
+     'SELECT * FROM exercises WHERE user_id = ? ORDER BY date DESC', (1,),
+     'idx_exercises_user_date'),
+    ('diagnoses_on_day',
+     'SELECT COUNT(*) FROM diagnoses WHERE user_id = ? AND created_at >= ? AND created_at < ?', (1, 0, 86400),
+     'idx_diagnoses_user_created'),
+    ('latest_diagnosis_by_type',
+     'SELECT * FROM diagnoses WHERE user_id = ? AND test_type = ? '
+     'ORDER BY diagnoses.created_at DESC, id DESC LIMIT 1', (1, 'adams_test'),
+     'idx_diagnoses_user_type_created'),
+    ('all_diagnoses',
+     'SELECT d.*, u.name FROM diagnoses d JOIN users u ON d.user_id = u.id ORDER BY d.created_at DESC', (),
+     'idx_diagnoses_created'),
+    ('all_exercises',
+     'SELECT e.*, u.name FROM exercises e JOIN users u ON e.user_id = u.id ORDER BY e.date DESC', (),
+     'idx_exercises_date'),
+    ('diagnoses_page',
+     'SELECT d.*, u.name FROM diagnoses d JOIN users u ON d.user_id = u.id '
+     'WHERE (d.created_at, d.id) < (?, ?) ORDER BY d.created_at DESC, d.id DESC LIMIT ?', (0, 0, 1000),
+     'idx_diagnoses_created'),
+    ('exercises_page',
+     'SELECT e.*, u.name FROM exercises e JOIN users u ON e.user_id = u.id '
+     'WHERE (e.date, e.id) < (?, ?) ORDER BY e.date DESC, e.id DESC LIMIT ?', ('', 0, 1000),
+     'idx_exercises_date'),
+    ('user_diagnoses_page',
+     'SELECT d.* FROM diagnoses d LEFT JOIN diagnosis_results r ON r.diagnosis_id = d.id AND r.algorithm_version = ? '
+     'WHERE d.user_id = ? AND (d.created_at, d.id) < (?, ?) ORDER BY d.created_at DESC, d.id DESC LIMIT ?',
+     (None, 1, 0, 0, 50), 'idx_diagnoses_user_created'),
+    ('user_trends',
+     'SELECT * FROM diagnosis_trends WHERE user_id = ? ORDER BY test_type', (1,),
+     'sqlite_autoindex_diagnosis_trends_1'),
+)
+
+
+def check_query_plans(repeat=None):
+    """쿼리 실행 계획이 인덱스를 사용하고 별도 정렬이 없는지 확인 (회귀 시 AssertionError)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with Database(os.path.join(directory, 'plans.db')) as db:
+            for name, sql, params, index in QUERY_PLAN_CHECKS:
+                plan = db.query_plan(sql, params)
+                assert any(index in step for step in plan), f"{name} does not use {index}: {plan}"
+                assert not any('TEMP B-TREE' in step for step in plan), f"{name} sorts in memory: {plan}"
+                results[name] = plan
+    return results
+
+
+# 새 프로세스에서 로그인 페이지를 처음 그리는 데 걸리는 시간을 측정하는 스크립트
+_STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.run()
+painted = time.perf_counter()
+app.run()
+rerun = time.perf_counter()
+heavy = [name for name in ('cv2', 'numpy', 'pandas', 'plotly', 'mediapipe', 'PIL') if name in sys.modules]
+print(json.dumps({
+    'streamlit_import_s': imported - started,
+    'first_paint_s': painted - imported,
+    'rerun_s': rerun - painted,
+    'heavy_modules_loaded': heavy,
+    'errors': [str(e.value) for e in app.exception]
+}))
+'''
+
+
+def bench_startup(repeat=3):
+    """로그인 페이지의 콜드 스타트와 첫 화면 렌더링 시간 (매번 새 프로세스와 빈 DB 사용)"""
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoliosis.py')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(app_path))
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', _STARTUP_SCRIPT, app_path],
+                cwd=directory, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            run = json.loads(output.strip().splitlines()[-1])
+            assert not run['errors'], f"login page raised: {run['errors']}"
+            run['cold_start_s'] = time.perf_counter() - started
+            runs.append(run)
+    best = min(runs, key=lambda run: run['cold_start_s'])
+    return best
+
+
+def synthetic_image(width, height, kind='adams_test', seed=0):
+    """등(아담스 테스트) 또는 서 있는 자세를 흉내 낸 합성 BGR 이미지"""
+    rng = np.random.default_rng(seed)
+    # 조명 그라디언트가 있는 배경
+    gradient = np.linspace(200, 240, width, dtype=np.float32)
+    image = np.repeat(np.tile(gradient, (height, 1))[:, :, None], 3, axis=2)
+    center = (width // 2, height // 2)
+    if kind == 'adams_test':
+        # 앞으로 굽힌 등: 큰 타원과 살짝 휜 척추선
+        cv2.ellipse(image, center, (width // 3, height // 4), 3, 0, 360, (90, 100, 120), -1)
+        ys = np.linspace(height // 4, 3 * height // 4, 50)
+        xs = width // 2 + (width // 40) * np.sin((ys - height // 4) / (height // 2) * np.pi)
+        cv2.polylines(image, [np.stack([xs, ys], axis=1).astype(np.int32)], False, (60, 60, 80), max(2, width // 300))
+    else:
+        # 서 있는 자세: 어깨가 약간 기운 몸통과 머리
+        tilt = height // 60
+        torso = np.array([
+            (width * 3 // 8, height // 4 - tilt), (width * 5 // 8, height // 4 + tilt),
+            (width * 9 // 16, height * 3 // 4), (width * 7 // 16, height * 3 // 4)
+        ], np.int32)
+        cv2.fillPoly(image, [torso], (90, 100, 120))
+        cv2.circle(image, (width // 2, height // 6), height // 14, (90, 100, 120), -1)
+    image += rng.normal(0, 6, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def bench_pipeline(repeat=5, resolutions=((640, 480), (1920, 1080), (4000, 3000))):
+    """합성 이미지 해상도별 이미지 파이프라인 단계 시간"""
+    processor = ImageProcessor()
+    results = {}
+    for width, height in resolutions:
+        for kind in ('adams_test', 'posture_check'):
+            image = synthetic_image(width, height, kind)
+            encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+
+            decoded = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+            gray, _ = processor._resize_to_working(processor._to_gray(decoded))
+            binary = processor._threshold(gray)
+            denoised = processor._denoise(binary)
+            preprocessed = processor.preprocess(decoded)
+            processor.clear_cache()
+
+            stages = {
+                'decode_s': _timeit(lambda: cv2.imdecode(encoded, cv2.IMREAD_COLOR), repeat),
+                'grayscale_resize_s': _timeit(
+                    lambda: processor._resize_to_working(processor._to_gray(decoded)), repeat),
+                'threshold_s': _timeit(lambda: processor._threshold(gray), repeat),
+                'morphology_s': _timeit(lambda: processor._denoise(binary), repeat),
+                'contours_s': _timeit(lambda: processor._find_contours(denoised), repeat),
+            }
+            if kind == 'adams_test':
+                stages['curvature_s'] = _timeit(lambda: processor.process_adams_test(preprocessed), repeat)
+            else:
+                stages['posture_metrics_s'] = _timeit(lambda: processor.process_posture(preprocessed), repeat)
+
+            def end_to_end():
+                processor.clear_cache()
+                analyze = processor.process_adams_test if kind == 'adams_test' else processor.process_posture
+                analyze(cv2.imdecode(encoded, cv2.IMREAD_COLOR))
+
+            stages['end_to_end_s'] = _timeit(end_to_end, repeat)
+            results[f"{kind}_{width}x{height}"] = stages
+    return results
+
+
+def _drift(full, roi):
+    """전체 프레임 결과와 ROI 결과의 절대 차이"""
+    if full is None or roi is None:
+        return None
+    if isinstance(full, dict):
+        return {key: abs(full[key] - roi[key]) for key in full}
+    return abs(full - roi)
+
+
+def bench_roi(repeat=5, resolutions=((1920, 1080), (4000, 3000)), max_dimensions=(None, 1024)):
+    """전체 프레임 탐색과 ROI 우선 탐색의 속도 향상 및 결과 차이"""
+    results = {}
+    for max_dimension in max_dimensions:
+        full = ImageProcessor(max_dimension=max_dimension)
+        roi = ImageProcessor(max_dimension=max_dimension, search_mode='roi')
+        for width, height in resolutions:
+            for kind in ('adams_test', 'posture_check'):
+                image = synthetic_image(width, height, kind)
+
+                def run(processor):
+                    processor.clear_cache()
+                    analyze = processor.process_adams_test if kind == 'adams_test' else processor.process_posture
+                    return analyze(image)
+
+                full_s = _timeit(lambda: run(full), repeat)
+                roi_s = _timeit(lambda: run(roi), repeat)
+                results[f"{kind}_{width}x{height}_max{max_dimension or 'full'}"] = {
+                    'full_frame_s': full_s,
+                    'roi_s': roi_s,
+                    'speedup': full_s / roi_s if roi_s else None,
+                    'roi': roi.locate_roi(roi._to_gray(image)),
+                    'drift': _drift(run(full), run(roi)),
+                }
+    return results
+
+
+def bench_analyzers(repeat=5, resolutions=((1920, 1080), (4000, 3000))):
+    """등록된 분석기를 하나씩 실행할 때와 analyze()로 전처리를 공유해 동시에 실행할 때의 시간"""
+    processor = ImageProcessor()
+    results = {}
+    for width, height in resolutions:
+        image = cv2.imencode('.jpg', synthetic_image(width, height))[1].tobytes()
+
+        def separate():
+            # 분석마다 따로 요청하던 방식 (매번 디코딩과 전처리를 다시 함)
+            for kind in ANALYZERS:
+                processor.clear_cache()
+                processor.run_analyzer(kind, image)
+
+        def shared():
+            processor.clear_cache()
+            return processor.analyze(image)
+
+        separate_s = _timeit(separate, repeat)
+        shared_s = _timeit(shared, repeat)
+        results[f"{width}x{height}"] = {
+            'analyzers': list(ANALYZERS),
+            'separate_s': separate_s,
+            'shared_s': shared_s,
+            'speedup': separate_s / shared_s if shared_s else None,
+        }
+    return results
+
+
+def bench_quality(repeat=5, resolutions=((1920, 1080), (4000, 3000))):
+    """품질 검사 시간과 거부되는 사진에서 줄어드는 분석 시간"""
+    processor = ImageProcessor()
+    gated = ImageProcessor(quality_gate=True)
+    results = {}
+    for width, height in resolutions:
+        image = synthetic_image(width, height)
+        cases = {
+            'good': image,
+            'blurry': cv2.GaussianBlur(image, (0, 0), max(width, height) / 200),
+            'dark': (image * 0.1).astype(np.uint8),
+            'blank': np.full_like(image, 128),
+        }
+        for name, case in cases.items():
+            data = cv2.imencode('.jpg', case)[1].tobytes()
+
+            def analyze(processor):
+                processor.clear_cache()
+                return processor.analyze(data)
+
+            quality = gated.check_quality(data)
+            results[f"{name}_{width}x{height}"] = {
+                'status': quality['status'],
+                'reasons': [reason['code'] for reason in quality['reasons']],
+                'check_s': _timeit(lambda: gated.check_quality(data), repeat),
+                'analysis_s': _timeit(lambda: analyze(processor), repeat),
+                'gated_analysis_s': _timeit(lambda: analyze(gated), repeat),
+            }
+    return results
+
+
+def _peak_memory(func):
+    """func 실행 중 numpy/OpenCV 할당의 최대 메모리(바이트)"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_ingest(repeat=5, resolutions=((1920, 1080), (4000, 3000))):
+    """업로드 바이트를 PIL로 디코딩하는 경로와 축소 그레이스케일 디코딩 경로의 시간/최대 메모리"""
+    from PIL import Image
+
+    processor = ImageProcessor()
+    results = {}
+    for width, height in resolutions:
+        data = cv2.imencode('.jpg', synthetic_image(width, height), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+        def via_pil():
+            processor.clear_cache()
+            image = cv2.cvtColor(np.array(Image.open(io.BytesIO(data))), cv2.COLOR_RGB2BGR)
+            return processor.process_adams_test(image)
+
+        def via_bytes():
+            processor.clear_cache()
+            return processor.process_adams_test(memoryview(data))
+
+        results[f"{width}x{height}"] = {
+            'pil_s': _timeit(via_pil, repeat),
+            'bytes_s': _timeit(via_bytes, repeat),
+            'pil_peak_bytes': _peak_memory(via_pil),
+            'bytes_peak_bytes': _peak_memory(via_bytes),
+            'drift': abs(via_pil() - via_bytes()),
+        }
+    return results
+
+
+def bench_database(repeat=5, row_counts=(1000, 100000, 1000000), users=100):
+    """행 수별 진단 기록 일괄 삽입과 조회 시간"""
+    results = {}
+    rng = np.random.default_rng(0)
+    today = date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in row_counts:
+            with Database(os.path.join(directory, f'bench_{rows}.db')) as db:
+                user_ids = [db.add_user(f'user{i}', 20, '남성') for i in range(users)]
+                records = [(user_ids[i % users], 'adams_test' if i % 2 else 'posture_check',
+                            float(value), None)
+                           for i, value in enumerate(rng.random(rows))]
+
+                started = time.perf_counter()
+                for offset in range(0, rows, 10000):
+                    db.add_diagnoses(records[offset:offset + 10000])
+                insert = time.perf_counter() - started
+
+                started = time.perf_counter()
+                for i in range(100):
+                    db.add_diagnosis(user_ids[0], 'adams_test', 0.1)
+                single_insert = (time.perf_counter() - started) / 100
+
+                user_id = user_ids[users // 2]
+                results[f"{rows}_rows"] = {
+                    'bulk_insert_s': insert,
+                    'bulk_insert_rows_per_sec': rows / insert,
+                    'single_insert_s': single_insert,
+                    'user_diagnoses_s': _timeit(lambda: db.get_user_diagnoses(user_id), repeat),
+                    'count_today_s': _timeit(lambda: db.count_diagnoses_on(user_id), repeat),
+                    'latest_by_type_s': _timeit(lambda: db.latest_diagnosis(user_id, 'adams_test'), repeat),
+                    'daily_stats_30d_s': _timeit(
+                        lambda: db.daily_diagnosis_stats(user_id, today - timedelta(days=30), today), repeat),
+                    'first_page_s': _timeit(lambda: db.get_diagnoses_page(limit=1000), repeat),
+                }
+    return results
+
+
+def compare_reports(baseline, current, tolerance=0.2, path=()):
+    """두 벤치마크 결과에서 tolerance 이상 느려진 *_s 항목 목록을 반환"""
+    regressions = []
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if old is None:
+            continue
+        if isinstance(value, dict):
+            regressions.extend(compare_reports(old, value, tolerance, path + (key,)))
+        elif key.endswith('_s') and isinstance(value, (int, float)) and old > 0 and value > old * (1 + tolerance):
+            regressions.append(('.'.join(path + (key,)), old, value))
+    return regressions
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine()
+    }
+
+
+BENCHMARKS = {
+    'pipeline': bench_pipeline,
+    'roi': bench_roi,
+    'ingest': bench_ingest,
+    'analyzers': bench_analyzers,
+    'quality': bench_quality,
+    'database': bench_database,
+    'curvature': bench_curvature,
+    'query_plans': check_query_plans,
+    'startup': bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="이미지 처리/데이터베이스 벤치마크")
+    parser.add_argument('names', nargs='*', help=f"실행할 벤치마크 {list(BENCHMARKS)} (기본값: 전체)")
+    parser.add_argument('--repeat', type=int, default=5, help="반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument('--db-rows', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help="database 벤치마크의 행 수")
+    parser.add_argument('--output', help="결과 JSON을 저장할 파일 (기본값: 표준 출력)")
+    parser.add_argument('--compare', help="비교할 이전 결과 JSON (느려진 항목이 있으면 종료 코드 1)")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="회귀로 판단할 상대 증가율")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    report = {'environment': _environment()}
+    for name in args.names or BENCHMARKS:
+        options = {'repeat': args.repeat}
+        if name == 'database':
+            options['row_counts'] = args.db_rows
+        report[name] = BENCHMARKS[name](**options)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.6f}s -> {new:.6f}s ({new / old - 1:+.0%})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,83 +1,525 @@
+import atexit
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+import logging
+import queue
 import threading
+import time
+
+from instrumentation import metrics, timed
+
+logger = logging.getLogger('scoliosis.database')
+
+# 모든 연결에 적용하는 PRAGMA 설정
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',   # WAL 모드에서는 체크포인트 시에만 fsync
+    'PRAGMA cache_size = -16000',    # 연결당 약 16MB 페이지 캐시
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000'     # 잠금 대기 시 바로 "database is locked"를 내지 않음
+)
+
+def _create_tables(conn):
+    cursor = conn.cursor()
+
+    # 사용자 정보 테이블
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            height REAL,
+            weight REAL,
+            scoliosis_type TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+    # 진단 기록 테이블
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS diagnoses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            test_type TEXT NOT NULL,
+            result REAL NOT NULL,
+            image_path TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # 운동 기록 테이블
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exercises (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            exercise_name TEXT NOT NULL,
+            completed BOOLEAN NOT NULL,
+            date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+def _add_indexes(conn):
+    # 사용자별 기록을 최신순으로 조회하는 쿼리용 복합 인덱스
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_diagnoses_user_created ON diagnoses (user_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_exercises_user_date ON exercises (user_id, date)')
+    # 전체 기록을 최신순으로 조회하는 리포트용 인덱스
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_diagnoses_created ON diagnoses (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_exercises_date ON exercises (date)')
+
+def _integer_timestamps(conn):
+    # 'YYYY-MM-DD HH:MM:SS' (로컬 시간) 문자열을 UTC 기준 epoch 초(INTEGER)로 변환
+    # SQLite는 컬럼 타입을 바꿀 수 없으므로 테이블을 다시 만들어 복사
+    # (NULL이거나 해석할 수 없는 값은 NOT NULL 제약을 지키도록 마이그레이션 시각으로 채움)
+    conn.execute('''
+        CREATE TABLE users_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            height REAL,
+            weight REAL,
+            scoliosis_type TEXT,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO users_new
+        SELECT id, name, age, gender, height, weight, scoliosis_type,
+               COALESCE(CAST(strftime('%s', created_at, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+        FROM users
+    ''')
+    conn.execute('''
+        CREATE TABLE diagnoses_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            test_type TEXT NOT NULL,
+            result REAL NOT NULL,
+            image_path TEXT,
+            created_at INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO diagnoses_new
+        SELECT id, user_id, test_type, result, image_path,
+               COALESCE(CAST(strftime('%s', created_at, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+        FROM diagnoses
+    ''')
+    conn.execute('DROP TABLE diagnoses')
+    conn.execute('DROP TABLE users')
+    conn.execute('ALTER TABLE users_new RENAME TO users')
+    conn.execute('ALTER TABLE diagnoses_new RENAME TO diagnoses')
+    conn.execute('CREATE INDEX idx_diagnoses_user_created ON diagnoses (user_id, created_at)')
+    conn.execute('CREATE INDEX idx_diagnoses_created ON diagnoses (created_at)')
+
+def _add_test_type_index(conn):
+    # 검사 종류별 최신 진단 조회용 인덱스
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_diagnoses_user_type_created ON diagnoses (user_id, test_type, created_at)')
+
+def _add_versioned_results(conn):
+    # 재분석 결과 (원본 diagnoses.result는 그대로 두고 알고리즘 버전별로 따로 저장)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS diagnosis_results (
+            diagnosis_id INTEGER NOT NULL,
+            algorithm_version INTEGER NOT NULL,
+            result REAL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (diagnosis_id, algorithm_version),
+            FOREIGN KEY (diagnosis_id) REFERENCES diagnoses (id)
+        )
+    ''')
+    # 재분석 작업 재개 지점 (검사 종류/버전별로 마지막으로 처리한 diagnoses.id)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reprocess_checkpoints (
+            algorithm_version INTEGER NOT NULL,
+            test_type TEXT NOT NULL,
+            last_diagnosis_id INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (algorithm_version, test_type)
+        )
+    ''')
+
+# 추이 요약의 지수 가중 이동 평균 계수 (바꾸면 새 마이그레이션으로 트리거와 요약을 다시 만들어야 함)
+TREND_ALPHA = 0.3
+
+def _trend_upsert(user_id, test_type, result, created_at):
+    # 진단 한 건을 (사용자, 검사 종류)별 추이 요약에 반영하는 UPSERT 문
+    # 기울기는 첫 진단 이후 경과 일수 t에 대한 최소제곱 합(Σt, Σy, Σt², Σty)으로 계산
+    days = f"(({created_at}) - first_at) / 86400.0"
+    return f'''
+        INSERT INTO diagnosis_trends (user_id, test_type, samples, first_at, last_at, last_result,
+                                      ewma, min_result, max_result, sum_t, sum_y, sum_tt, sum_ty)
+        VALUES ({user_id}, {test_type}, 1, {created_at}, {created_at}, {result},
+                {result}, {result}, {result}, 0, {result}, 0, 0)
+        ON CONFLICT (user_id, test_type) DO UPDATE SET
+            samples = samples + 1,
+            last_at = MAX(last_at, excluded.last_at),
+            last_result = excluded.last_result,
+            ewma = {TREND_ALPHA} * excluded.ewma + {1 - TREND_ALPHA} * ewma,
+            min_result = MIN(min_result, excluded.min_result),
+            max_result = MAX(max_result, excluded.max_result),
+            sum_t = sum_t + {days},
+            sum_y = sum_y + excluded.sum_y,
+            sum_tt = sum_tt + {days} * {days},
+            sum_ty = sum_ty + {days} * excluded.sum_y
+    '''
+
+def _rebuild_trends(conn):
+    # 기존 진단을 시간순으로 다시 반영하여 추이 요약을 만듦
+    conn.execute('DELETE FROM diagnosis_trends')
+    conn.executemany(
+        _trend_upsert(':user_id', ':test_type', ':result', ':created_at'),
+        (dict(zip(('user_id', 'test_type', 'result', 'created_at'), row)) for row in conn.execute('''
+            SELECT user_id, test_type, result, created_at FROM diagnoses
+            ORDER BY user_id, test_type, created_at, id
+        '''))
+    )
+
+def _add_trend_summary(conn):
+    # (사용자, 검사 종류)별 진단 추이 요약 (진단이 추가될 때마다 트리거로 갱신)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS diagnosis_trends (
+            user_id INTEGER NOT NULL,
+            test_type TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            first_at INTEGER NOT NULL,
+            last_at INTEGER NOT NULL,
+            last_result REAL NOT NULL,
+            ewma REAL NOT NULL,
+            min_result REAL NOT NULL,
+            max_result REAL NOT NULL,
+            sum_t REAL NOT NULL,
+            sum_y REAL NOT NULL,
+            sum_tt REAL NOT NULL,
+            sum_ty REAL NOT NULL,
+            PRIMARY KEY (user_id, test_type),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_diagnoses_trend AFTER INSERT ON diagnoses
+        BEGIN
+            {_trend_upsert('NEW.user_id', 'NEW.test_type', 'NEW.result', 'NEW.created_at')};
+        END
+    ''')
+    _rebuild_trends(conn)
+
+# (버전, 설명, 적용 함수) 순서대로 한 번씩만 적용되며, 이미 배포된 항목은 수정하지 않고 새 항목을 추가
+MIGRATIONS = (
+    (1, 'initial schema', _create_tables),
+    (2, 'composite indexes for per-user history queries', _add_indexes),
+    (3, 'integer epoch timestamps for users and diagnoses', _integer_timestamps),
+    (4, 'index for latest diagnosis per test type', _add_test_type_index),
+    (5, 'versioned reprocessing results and checkpoints', _add_versioned_results),
+    (6, 'incremental per-user diagnosis trend summary', _add_trend_summary),
+)
+
+# 저장된 epoch 초를 기존과 같은 로컬 시간 문자열로 변환하는 SQL 식
+def _local_time(column):
+    return f"datetime({column}, 'unixepoch', 'localtime')"
+
+def _day_bounds(day):
+    # 로컬 날짜 하루의 [시작, 끝) 범위를 epoch 초로 변환
+    start = datetime.combine(day, datetime.min.time())
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+def _range_bounds(start_day=None, end_day=None):
+    # [start_day, end_day] 로컬 날짜 범위를 epoch 초 [시작, 끝)으로 변환 (생략하면 제한 없음)
+    start = _day_bounds(start_day)[0] if start_day else 0
+    end = _day_bounds(end_day)[1] if end_day else 2 ** 62
+    return start, end
+
+DIAGNOSIS_COLUMNS = f"id, user_id, test_type, result, image_path, {_local_time('created_at')} AS created_at"
+# get_all_diagnoses / get_all_exercises 결과의 컬럼 이름
+DIAGNOSIS_REPORT_COLUMNS = ('id', 'user_id', 'test_type', 'result', 'image_path', 'created_at', 'name', 'scoliosis_type')
+EXERCISE_REPORT_COLUMNS = ('id', 'user_id', 'exercise_name', 'completed', 'date', 'name')
+
+# get_trends 결과의 키 (slope는 하루당, rate_per_month는 30일당 측정값 변화,
+# 기록 기간이 TREND_MIN_SPAN_DAYS보다 짧으면 둘 다 None)
+TREND_COLUMNS = ('user_id', 'test_type', 'samples', 'first_at', 'last_at', 'last_result', 'ewma',
+                 'min_result', 'max_result', 'slope', 'rate_per_month')
+# 한 번에 여러 번 다시 찍은 기록으로 하루당 변화가 부풀려지지 않도록 기울기를 계산할 최소 기록 기간(일)
+TREND_MIN_SPAN_DAYS = 7
+TREND_SLOPE = f'''
+    CASE WHEN last_at - first_at < {TREND_MIN_SPAN_DAYS} * 86400 THEN NULL
+         WHEN samples * sum_tt - sum_t * sum_t > 1e-9
+         THEN (samples * sum_ty - sum_t * sum_y) / (samples * sum_tt - sum_t * sum_t)
+         ELSE 0.0 END
+'''
+# diagnosis_series의 집계 단위별 로컬 날짜 식 (주는 월요일 시작)
+SERIES_BUCKETS = {
+    'day': "date(d.created_at, 'unixepoch', 'localtime')",
+    'week': "date(d.created_at, 'unixepoch', 'localtime', 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', d.created_at, 'unixepoch', 'localtime')",
+}
+
+def series_bucket(count, span_days, max_points=500):
+    """진단 수와 기간 길이(일)로 차트 점이 max_points를 넘지 않는 가장 작은 집계 단위 (None이면 원본)"""
+    if count <= max_points:
+        return None
+    if span_days <= max_points:
+        return 'day'
+    if span_days / 7 <= max_points:
+        return 'week'
+    return 'month'
+
+# 30일당 측정값 증가가 이 값 이상이면 진행 경고 (검사 종류별 측정값 단위가 다름)
+PROGRESSION_ALERT_RATES = {'adams_test': 0.1, 'posture_check': 0.05}
+
+# 내보내기/가져오기 대상 테이블 (추이 요약은 진단을 가져올 때 트리거로 다시 만들어짐)
+EXPORT_TABLES = ('users', 'diagnoses', 'exercises', 'diagnosis_results')
+
+USER_COLUMNS = f"id, name, age, gender, height, weight, scoliosis_type, {_local_time('created_at')} AS created_at"
 
 class Database:
-    def __init__(self):
-        self.db_path = 'scoliosis.db'
-        self._create_tables()
-        self._local = threading.local()
-    
-    def _get_connection(self):
-        if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path)
-        return self._local.connection
-    
-    def _create_tables(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 사용자 정보 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                gender TEXT NOT NULL,
-                height REAL,
-                weight REAL,
-                scoliosis_type TEXT,
-                created_at TEXT NOT NULL
-            )
-        ''')
-        
-        # 진단 기록 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS diagnoses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                test_type TEXT NOT NULL,
-                result REAL NOT NULL,
-                image_path TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # 운동 기록 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exercises (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                exercise_name TEXT NOT NULL,
-                completed BOOLEAN NOT NULL,
-                date TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
+    def __init__(self, db_path='scoliosis.db', pool_size=5, write_behind=False,
+                 batch_size=200, flush_interval=0.5):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        # 연결 풀 (필요할 때 pool_size개까지 생성하여 재사용)
+        self._pool = queue.Queue()
+        self._pool_lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+        self._migrate()
+
+        # 쓰기 지연 큐 (진단/운동 기록을 모아서 한 트랜잭션으로 저장)
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._write_queue = queue.Queue()
+        # 저장하지 못한 쓰기 (sql, params, 오류 메시지), flush()가 반환하고 비움
+        self._write_errors = []
+        self._writer = None
+        if write_behind:
+            self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+            self._writer.start()
+            # close()를 호출하지 않고 프로세스가 끝나도 대기 중인 쓰기를 저장
+            atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+        conn.execute('PRAGMA journal_mode = WAL')
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """풀에서 연결을 빌려주고 사용이 끝나면 반환하는 컨텍스트 매니저"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Database is closed")
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._pool_lock:
+                if len(self._connections) < self.pool_size:
+                    conn = self._connect()
+                    self._connections.append(conn)
+            if conn is None:
+                conn = self._pool.get()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """대기 중인 쓰기를 저장하고 모든 연결을 닫는 함수"""
+        if self._closed:
+            return
+        if self._writer is not None:
+            atexit.unregister(self.close)
+            errors = self.flush()
+            if errors:
+                logger.error("%d write-behind rows were dropped before close", len(errors))
+            self._write_queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._closed = True
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._pool = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def flush(self):
+        """쓰기 지연 큐에 남은 기록이 모두 저장될 때까지 기다리는 함수
+
+        마지막 flush() 이후 저장하지 못한 쓰기를 (sql, params, 오류 메시지) 목록으로 반환합니다.
+        """
+        if self._writer is not None:
+            self._write_queue.join()
+        with self._pool_lock:
+            errors, self._write_errors = self._write_errors, []
+        return errors
+
+    def _sync_pending(self):
+        # 방금 추가한 기록이 조회 결과에 보이도록 읽기 전에 대기 중인 쓰기를 저장
+        # (저장하지 못한 쓰기 목록은 flush()/close()가 반환하도록 남겨 둠)
+        if self._writer is not None and self._write_queue.unfinished_tasks:
+            self._write_queue.join()
+
+    def _write(self, sql, params, done=None):
+        # done(error)은 기록이 저장되면 None으로, 저장하지 못하면 오류 메시지로 호출
+        if self._writer is not None:
+            self._write_queue.put((sql, params, done))
+            return
+        try:
+            with self._connection() as conn:
+                with conn:
+                    conn.execute(sql, params)
+        except Exception as e:
+            if done is None:
+                raise
+            done(str(e))
+            return
+        if done is not None:
+            done(None)
+
+    def _write_loop(self):
+        with self._connection() as conn:
+            while True:
+                item = self._write_queue.get()
+                if item is None:
+                    self._write_queue.task_done()
+                    return
+
+                # 잠시 기다리며 batch_size개까지 모아서 한 트랜잭션으로 처리
+                batch = [item]
+                stop = False
+                try:
+                    while len(batch) < self.batch_size:
+                        item = self._write_queue.get(timeout=self.flush_interval)
+                        if item is None:
+                            stop = True
+                            break
+                        batch.append(item)
+                except queue.Empty:
+                    pass
+
+                try:
+                    with metrics.timer('db.write_behind_flush'):
+                        self._write_batch(conn, batch)
+                finally:
+                    for _ in batch:
+                        self._write_queue.task_done()
+
+                if stop:
+                    self._write_queue.task_done()
+                    return
+
+    def _write_batch(self, conn, batch):
+        try:
+            with conn:
+                for sql, params, _ in batch:
+                    conn.execute(sql, params)
+            metrics.increment('db.write_behind_rows', len(batch))
+            for _, _, done in batch:
+                self._notify(done, None)
+            return
+        except Exception as e:
+            logger.warning("write-behind batch of %d failed, retrying row by row: %s", len(batch), e)
+
+        # 한 행의 오류로 나머지 행까지 잃지 않도록 행마다 따로 저장
+        for sql, params, done in batch:
+            try:
+                with conn:
+                    conn.execute(sql, params)
+                metrics.increment('db.write_behind_rows')
+            except Exception as e:
+                metrics.increment('db.write_behind_failed')
+                logger.error("write-behind row dropped: %s %r", e, params)
+                with self._pool_lock:
+                    self._write_errors.append((sql, params, str(e)))
+                self._notify(done, str(e))
+                continue
+            self._notify(done, None)
+
+    def _notify(self, done, error):
+        # 콜백 오류로 쓰기 스레드가 멈추지 않도록 함
+        if done is None:
+            return
+        try:
+            done(error)
+        except Exception as e:
+            logger.error("write-behind callback failed: %s", e)
+
+    def _migrate(self):
+        """schema_version 테이블을 기준으로 아직 적용되지 않은 마이그레이션을 순서대로 적용"""
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at INTEGER NOT NULL
+                )
+            ''')
+            conn.commit()
+
+            for version, description, migrate in MIGRATIONS:
+                # 여러 프로세스가 동시에 시작해도 한 번만 적용되도록 쓰기 잠금을 잡은 뒤 다시 확인
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                        conn.rollback()
+                        continue
+                    migrate(conn)
+                    conn.execute(
+                        'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                        (version, description, int(time.time()))
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def schema_version(self):
+        with self._connection() as conn:
+            return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+
+    def query_plan(self, sql, params=()):
+        """쿼리 실행 계획(EXPLAIN QUERY PLAN)의 detail 목록을 반환하는 함수"""
+        with self._connection() as conn:
+            return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+    @timed('db.add_user')
     def add_user(self, name, age, gender, height=None, weight=None, scoliosis_type=None):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO users (name, age, gender, height, weight, scoliosis_type, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, age, gender, height, weight, scoliosis_type, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-        conn.commit()
-        return cursor.lastrowid
-    
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (name, age, gender, height, weight, scoliosis_type, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, age, gender, height, weight, scoliosis_type, int(time.time())))
+            conn.commit()
+            return cursor.lastrowid
+
+    @timed('db.get_user')
     def get_user(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        return cursor.fetchone()
-    
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,))
+            return cursor.fetchone()
+
+    @timed('db.get_user_ids')
+    def get_user_ids(self):
+        with self._connection() as conn:
+            return [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+
+    @timed('db.update_user')
     def update_user(self, user_id, height=None, weight=None, scoliosis_type=None):
-        conn = self._get_connection()
-        cursor = conn.cursor()
         updates = []
         values = []
         if height is not None:
@@ -89,72 +531,487 @@ class Database:
         if scoliosis_type is not None:
             updates.append('scoliosis_type = ?')
             values.append(scoliosis_type)
-        
+
         if updates:
             values.append(user_id)
-            cursor.execute(f'''
-                UPDATE users 
-                SET {', '.join(updates)}
-                WHERE id = ?
-            ''', values)
-            conn.commit()
-    
-    def add_diagnosis(self, user_id, test_type, result, image_path=None):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+            with self._connection() as conn:
+                conn.execute(f'''
+                    UPDATE users
+                    SET {', '.join(updates)}
+                    WHERE id = ?
+                ''', values)
+                conn.commit()
+
+    @timed('db.add_diagnosis')
+    def add_diagnosis(self, user_id, test_type, result, image_path=None, done=None):
+        """진단 기록 추가 (쓰기 지연 모드에서 done(error)은 실제로 저장되거나 실패한 뒤 호출)"""
+        self._write('''
             INSERT INTO diagnoses (user_id, test_type, result, image_path, created_at)
             VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, test_type, result, image_path, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-        conn.commit()
-    
+        ''', (user_id, test_type, result, image_path, int(time.time())), done)
+
+    @timed('db.add_diagnoses')
+    def add_diagnoses(self, records):
+        """(user_id, test_type, result, image_path) 목록을 한 트랜잭션으로 저장"""
+        created_at = int(time.time())
+        with self._connection() as conn:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO diagnoses (user_id, test_type, result, image_path, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(user_id, test_type, result, image_path, created_at)
+                      for user_id, test_type, result, image_path in records])
+        return len(records)
+
+    @timed('db.get_all_diagnoses')
     def get_all_diagnoses(self):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT d.*, u.name, u.scoliosis_type 
-            FROM diagnoses d 
-            JOIN users u ON d.user_id = u.id 
-            ORDER BY d.created_at DESC
-        ''')
-        return cursor.fetchall()
-    
-    def get_user_diagnoses(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM diagnoses 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC
-        ''', (user_id,))
-        return cursor.fetchall()
-    
+        self._sync_pending()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT d.id, d.user_id, d.test_type, d.result, d.image_path,
+                       {_local_time('d.created_at')} AS created_at, u.name, u.scoliosis_type
+                FROM diagnoses d
+                JOIN users u ON d.user_id = u.id
+                ORDER BY d.created_at DESC
+            ''')
+            return cursor.fetchall()
+
+    @timed('db.get_user_diagnoses')
+    def get_user_diagnoses(self, user_id, algorithm_version=None):
+        """사용자의 진단 기록 (algorithm_version을 지정하면 재분석 결과가 있는 행은 그 값으로 대체)"""
+        self._sync_pending()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            if algorithm_version is None:
+                cursor.execute(f'''
+                    SELECT {DIAGNOSIS_COLUMNS} FROM diagnoses
+                    WHERE user_id = ?
+                    ORDER BY diagnoses.created_at DESC
+                ''', (user_id,))
+            else:
+                cursor.execute(f'''
+                    SELECT d.id, d.user_id, d.test_type, COALESCE(r.result, d.result), d.image_path,
+                           {_local_time('d.created_at')} AS created_at
+                    FROM diagnoses d
+                    LEFT JOIN diagnosis_results r
+                        ON r.diagnosis_id = d.id AND r.algorithm_version = ?
+                    WHERE d.user_id = ?
+                    ORDER BY d.created_at DESC
+                ''', (algorithm_version, user_id))
+            return cursor.fetchall()
+
+    @timed('db.get_user_diagnoses_page')
+    def get_user_diagnoses_page(self, user_id, after=None, limit=50, algorithm_version=None):
+        """get_user_diagnoses와 같은 순서의 한 페이지와 다음 페이지 커서를 반환하는 함수
+
+        get_diagnoses_page와 같은 (created_at, id) 키셋 커서를 사용하며, 마지막 페이지이면 커서는 None입니다.
+        """
+        self._sync_pending()
+        condition = 'AND (d.created_at, d.id) < (?, ?)' if after else ''
+        with self._connection() as conn:
+            rows = conn.execute(f'''
+                SELECT d.id, d.user_id, d.test_type, COALESCE(r.result, d.result), d.image_path,
+                       {_local_time('d.created_at')} AS created_at, d.created_at
+                FROM diagnoses d
+                LEFT JOIN diagnosis_results r
+                    ON r.diagnosis_id = d.id AND r.algorithm_version = ?
+                WHERE d.user_id = ? {condition}
+                ORDER BY d.created_at DESC, d.id DESC
+                LIMIT ?
+            ''', (algorithm_version, user_id, *(after or ()), limit)).fetchall()
+        cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return [row[:-1] for row in rows], cursor
+
+    @timed('db.count_diagnoses_between')
+    def count_diagnoses_between(self, user_id, start_day=None, end_day=None):
+        """[start_day, end_day] 기간의 진단 횟수 (날짜를 생략하면 그쪽 기간 제한 없음)"""
+        start, end = _range_bounds(start_day, end_day)
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM diagnoses
+                WHERE user_id = ? AND created_at >= ? AND created_at < ?
+            ''', (user_id, start, end)).fetchone()[0]
+
+    @timed('db.diagnosis_series')
+    def diagnosis_series(self, user_id, start_day=None, end_day=None, bucket=None, algorithm_version=None):
+        """차트용 (시각, 검사 종류, 횟수, 평균, 최소, 최대) 목록
+
+        bucket이 None이면 진단마다 한 행을, 'day'/'week'/'month'이면 기간별로 집계한 행을 반환하므로
+        긴 기록도 차트에 보내는 점의 수가 기간 수로 제한됩니다.
+        """
+        start, end = _range_bounds(start_day, end_day)
+        result = 'COALESCE(r.result, d.result)'
+        if bucket is None:
+            columns = f"{_local_time('d.created_at')} AS period, d.test_type, 1, {result}, {result}, {result}"
+            grouping = 'ORDER BY d.created_at, d.test_type'
+        else:
+            columns = (f"{SERIES_BUCKETS[bucket]} AS period, d.test_type, "
+                       f"COUNT(*), AVG({result}), MIN({result}), MAX({result})")
+            grouping = 'GROUP BY period, d.test_type ORDER BY period, d.test_type'
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute(f'''
+                SELECT {columns}
+                FROM diagnoses d
+                LEFT JOIN diagnosis_results r
+                    ON r.diagnosis_id = d.id AND r.algorithm_version = ?
+                WHERE d.user_id = ? AND d.created_at >= ? AND d.created_at < ?
+                {grouping}
+            ''', (algorithm_version, user_id, start, end)).fetchall()
+
+    @timed('db.get_algorithm_versions')
+    def get_algorithm_versions(self, user_id=None):
+        """재분석 결과가 있는 알고리즘 버전 목록"""
+        with self._connection() as conn:
+            if user_id is None:
+                rows = conn.execute('''
+                    SELECT DISTINCT algorithm_version FROM diagnosis_results ORDER BY algorithm_version
+                ''').fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT DISTINCT r.algorithm_version
+                    FROM diagnosis_results r
+                    JOIN diagnoses d ON d.id = r.diagnosis_id
+                    WHERE d.user_id = ?
+                    ORDER BY r.algorithm_version
+                ''', (user_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_reprocess_checkpoint(self, algorithm_version, test_type):
+        with self._connection() as conn:
+            row = conn.execute('''
+                SELECT last_diagnosis_id FROM reprocess_checkpoints
+                WHERE algorithm_version = ? AND test_type = ?
+            ''', (algorithm_version, test_type)).fetchone()
+        return row[0] if row else 0
+
+    @timed('db.get_reprocess_batch')
+    def get_reprocess_batch(self, test_type, after_id, limit):
+        """after_id 이후의 (id, image_path) 목록 (id 오름차순)"""
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT id, image_path FROM diagnoses
+                WHERE test_type = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (test_type, after_id, limit)).fetchall()
+
+    @timed('db.save_reprocessed_results')
+    def save_reprocessed_results(self, algorithm_version, test_type, results, last_diagnosis_id):
+        """(diagnosis_id, result) 목록과 재개 지점을 한 트랜잭션으로 저장"""
+        now = int(time.time())
+        with self._connection() as conn:
+            with conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO diagnosis_results (diagnosis_id, algorithm_version, result, created_at)
+                    VALUES (?, ?, ?, ?)
+                ''', [(diagnosis_id, algorithm_version, result, now) for diagnosis_id, result in results])
+                conn.execute('''
+                    INSERT OR REPLACE INTO reprocess_checkpoints
+                        (algorithm_version, test_type, last_diagnosis_id, updated_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (algorithm_version, test_type, last_diagnosis_id, now))
+
+    @timed('db.get_trends')
+    def get_trends(self, user_id, test_type=None):
+        """사용자의 검사 종류별 추이 요약 (EWMA, 최소/최대, 기울기, 진행 속도) 딕셔너리 목록"""
+        self._sync_pending()
+        query = f'''
+            SELECT user_id, test_type, samples, {_local_time('first_at')}, {_local_time('last_at')},
+                   last_result, ewma, min_result, max_result, {TREND_SLOPE} AS slope, {TREND_SLOPE} * 30 AS rate_per_month
+            FROM diagnosis_trends
+            WHERE user_id = ?
+        '''
+        params = [user_id]
+        if test_type is not None:
+            query += ' AND test_type = ?'
+            params.append(test_type)
+        with self._connection() as conn:
+            rows = conn.execute(query + ' ORDER BY test_type', params).fetchall()
+        return [dict(zip(TREND_COLUMNS, row)) for row in rows]
+
+    def get_progression_alerts(self, user_id, min_samples=3, rates=PROGRESSION_ALERT_RATES):
+        """진행 속도가 검사 종류별 기준 이상인 추이 요약 목록
+
+        기록이 min_samples개 이상이고 기록 기간이 TREND_MIN_SPAN_DAYS 이상인 경우만 포함합니다.
+        """
+        return [
+            trend for trend in self.get_trends(user_id)
+            if trend['samples'] >= min_samples
+            and trend['rate_per_month'] is not None
+            and trend['test_type'] in rates
+            and trend['rate_per_month'] >= rates[trend['test_type']]
+        ]
+
+    def rebuild_trends(self):
+        """진단 기록 전체로 추이 요약을 다시 만드는 함수 (시간순이 아닌 가져오기 후 사용)"""
+        self._sync_pending()
+        with self._connection() as conn:
+            with conn:
+                _rebuild_trends(conn)
+
+    @timed('db.add_exercise')
     def add_exercise(self, user_id, exercise_name, completed, date):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
+        self._write('''
             INSERT INTO exercises (user_id, exercise_name, completed, date)
             VALUES (?, ?, ?, ?)
         ''', (user_id, exercise_name, completed, date))
-        conn.commit()
-    
+
+    @timed('db.get_all_exercises')
     def get_all_exercises(self):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT e.*, u.name 
-            FROM exercises e 
-            JOIN users u ON e.user_id = u.id 
-            ORDER BY e.date DESC
-        ''')
-        return cursor.fetchall()
-    
+        self._sync_pending()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT e.*, u.name
+                FROM exercises e
+                JOIN users u ON e.user_id = u.id
+                ORDER BY e.date DESC
+            ''')
+            return cursor.fetchall()
+
+    @timed('db.get_diagnoses_page')
+    def get_diagnoses_page(self, after=None, limit=1000):
+        """get_all_diagnoses와 같은 순서의 한 페이지와 다음 페이지 커서를 반환하는 함수
+
+        커서는 (created_at, id) 키셋이므로 OFFSET 없이 인덱스에서 바로 이어서 읽습니다.
+        마지막 페이지이면 커서는 None입니다.
+        """
+        self._sync_pending()
+        condition = 'WHERE (d.created_at, d.id) < (?, ?)' if after else ''
+        with self._connection() as conn:
+            rows = conn.execute(f'''
+                SELECT d.id, d.user_id, d.test_type, d.result, d.image_path,
+                       {_local_time('d.created_at')} AS created_at, u.name, u.scoliosis_type,
+                       d.created_at
+                FROM diagnoses d
+                JOIN users u ON d.user_id = u.id
+                {condition}
+                ORDER BY d.created_at DESC, d.id DESC
+                LIMIT ?
+            ''', (*(after or ()), limit)).fetchall()
+        cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return [row[:-1] for row in rows], cursor
+
+    @timed('db.get_exercises_page')
+    def get_exercises_page(self, after=None, limit=1000):
+        """get_all_exercises와 같은 순서의 한 페이지와 다음 페이지 커서 ((date, id) 키셋)"""
+        self._sync_pending()
+        condition = 'WHERE (e.date, e.id) < (?, ?)' if after else ''
+        with self._connection() as conn:
+            rows = conn.execute(f'''
+                SELECT e.id, e.user_id, e.exercise_name, e.completed, e.date, u.name
+                FROM exercises e
+                JOIN users u ON e.user_id = u.id
+                {condition}
+                ORDER BY e.date DESC, e.id DESC
+                LIMIT ?
+            ''', (*(after or ()), limit)).fetchall()
+        cursor = (rows[-1][4], rows[-1][0]) if len(rows) == limit else None
+        return rows, cursor
+
+    def iter_all_diagnoses(self, chunk_size=1000, format='rows'):
+        """전체 진단 기록을 chunk_size개씩 나누어 반환하는 제너레이터
+
+        format: 'rows'(튜플 목록), 'dataframe'(pandas DataFrame),
+        'columns'(컬럼 이름 -> 값 목록 딕셔너리, pyarrow.RecordBatch.from_pydict 등에 사용)
+        """
+        return self._iter_pages(self.get_diagnoses_page, DIAGNOSIS_REPORT_COLUMNS, chunk_size, format)
+
+    def iter_all_exercises(self, chunk_size=1000, format='rows'):
+        """전체 운동 기록을 chunk_size개씩 나누어 반환하는 제너레이터 (format은 iter_all_diagnoses 참고)"""
+        return self._iter_pages(self.get_exercises_page, EXERCISE_REPORT_COLUMNS, chunk_size, format)
+
+    def _iter_pages(self, get_page, columns, chunk_size, format):
+        if format not in ('rows', 'dataframe', 'columns'):
+            raise ValueError(f"Unknown format: {format}")
+        if format == 'dataframe':
+            import pandas as pd
+
+        cursor = None
+        while True:
+            rows, cursor = get_page(after=cursor, limit=chunk_size)
+            if rows:
+                if format == 'dataframe':
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+                elif format == 'columns':
+                    yield {name: list(values) for name, values in zip(columns, zip(*rows))}
+                else:
+                    yield rows
+            if cursor is None:
+                return
+
+    def export_tables(self, tables=EXPORT_TABLES, chunk_size=10000):
+        """테이블마다 (테이블, 컬럼 목록, 행 청크)를 차례로 내보내는 제너레이터
+
+        모든 테이블을 한 읽기 트랜잭션에서 읽으므로 같은 시점의 스냅숏이 되고,
+        WAL 모드에서는 내보내는 동안에도 쓰기가 막히지 않습니다. 메모리에는 청크 하나만 유지합니다.
+        """
+        self._sync_pending()
+        with self._connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                for table in tables:
+                    cursor = conn.execute(f'SELECT * FROM {table} ORDER BY rowid')
+                    columns = tuple(column[0] for column in cursor.description)
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield table, columns, rows
+            finally:
+                conn.rollback()
+
+    def table_schema(self, table):
+        """테이블의 (컬럼 이름, 선언된 타입) 목록"""
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        with self._connection() as conn:
+            return [(row[1], row[2].upper()) for row in conn.execute(f'PRAGMA table_info({table})')]
+
+    @contextmanager
+    def deferred_indexes(self, tables=EXPORT_TABLES):
+        """대량 가져오기 동안 tables의 보조 인덱스를 지웠다가 끝나면 (실패해도) 한 번에 다시 만드는 컨텍스트 매니저"""
+        self.flush()
+        with self._connection() as conn:
+            placeholders = ', '.join('?' * len(tables))
+            indexes = conn.execute(f'''
+                SELECT name, sql FROM sqlite_master
+                WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+            ''', tables).fetchall()
+            with conn:
+                for name, _ in indexes:
+                    conn.execute(f'DROP INDEX {name}')
+        try:
+            yield
+        finally:
+            with self._connection() as conn:
+                with conn:
+                    for _, sql in indexes:
+                        conn.execute(sql)
+
+    @timed('db.import_rows')
+    def import_rows(self, table, columns, rows):
+        """행 목록을 한 트랜잭션에서 executemany로 저장하고 저장한 행 수를 반환"""
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        placeholders = ', '.join('?' * len(columns))
+        with self._connection() as conn:
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+                )
+        return len(rows)
+
+    @timed('db.backup')
+    def backup(self, dest_path, pages=-1, progress=None):
+        """SQLite 온라인 백업 API로 dest_path에 데이터베이스 전체를 복사하는 함수
+
+        WAL 모드에서는 읽기 트랜잭션이 쓰기를 막지 않으므로 기본값(pages=-1)처럼 한 단계로 복사하면
+        쓰기를 계속 받으면서 한 시점의 스냅숏을 얻습니다. pages를 나누면 단계 사이에 다른 연결이
+        쓸 때마다 백업이 처음부터 다시 시작되므로 쓰기가 잦으면 끝나지 않을 수 있습니다.
+        progress(status, remaining, total)는 단계마다 호출됩니다.
+        """
+        self.flush()
+        target = sqlite3.connect(dest_path)
+        try:
+            with self._connection() as conn:
+                conn.backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+
+    @timed('db.get_user_exercises')
     def get_user_exercises(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM exercises 
-            WHERE user_id = ? 
-            ORDER BY date DESC
-        ''', (user_id,))
-        return cursor.fetchall() 
\ No newline at end of file
+        self._sync_pending()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM exercises
+                WHERE user_id = ?
+                ORDER BY date DESC
+            ''', (user_id,))
+            return cursor.fetchall()
+
+    @timed('db.recent_completed_exercises')
+    def recent_completed_exercises(self, user_id, days=7, day=None):
+        """day(기본값: 오늘)까지 최근 days일 동안 완료한 운동 이름 집합"""
+        start = (day or date.today()) - timedelta(days=days - 1)
+        self._sync_pending()
+        with self._connection() as conn:
+            rows = conn.execute('''
+                SELECT DISTINCT exercise_name FROM exercises
+                WHERE user_id = ? AND date >= ? AND completed
+            ''', (user_id, start.strftime('%Y-%m-%d'))).fetchall()
+        return {row[0] for row in rows}
+
+    @timed('db.count_diagnoses_on')
+    def count_diagnoses_on(self, user_id, day=None):
+        """특정 날짜(기본값: 오늘)의 진단 횟수"""
+        start, end = _day_bounds(day or date.today())
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM diagnoses
+                WHERE user_id = ? AND created_at >= ? AND created_at < ?
+            ''', (user_id, start, end)).fetchone()[0]
+
+    @timed('db.latest_diagnosis')
+    def latest_diagnosis(self, user_id, test_type=None):
+        """가장 최근 진단 기록 (test_type을 지정하면 해당 검사만, 없으면 None)"""
+        self._sync_pending()
+        with self._connection() as conn:
+            if test_type is None:
+                return conn.execute(f'''
+                    SELECT {DIAGNOSIS_COLUMNS} FROM diagnoses
+                    WHERE user_id = ?
+                    ORDER BY diagnoses.created_at DESC, id DESC
+                    LIMIT 1
+                ''', (user_id,)).fetchone()
+            return conn.execute(f'''
+                SELECT {DIAGNOSIS_COLUMNS} FROM diagnoses
+                WHERE user_id = ? AND test_type = ?
+                ORDER BY diagnoses.created_at DESC, id DESC
+                LIMIT 1
+            ''', (user_id, test_type)).fetchone()
+
+    @timed('db.count_completed_exercises_on')
+    def count_completed_exercises_on(self, user_id, day=None):
+        """특정 날짜(기본값: 오늘)에 완료한 운동 횟수"""
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM exercises
+                WHERE user_id = ? AND date = ? AND completed
+            ''', (user_id, (day or date.today()).strftime('%Y-%m-%d'))).fetchone()[0]
+
+    @timed('db.daily_exercise_stats')
+    def daily_exercise_stats(self, user_id, start_day, end_day):
+        """[start_day, end_day] 기간의 날짜별 (날짜, 전체 운동 수, 완료한 운동 수)"""
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT date, COUNT(*), SUM(CASE WHEN completed THEN 1 ELSE 0 END)
+                FROM exercises
+                WHERE user_id = ? AND date >= ? AND date <= ?
+                GROUP BY date
+                ORDER BY date
+            ''', (user_id, start_day.strftime('%Y-%m-%d'), end_day.strftime('%Y-%m-%d'))).fetchall()
+
+    @timed('db.daily_diagnosis_stats')
+    def daily_diagnosis_stats(self, user_id, start_day, end_day):
+        """[start_day, end_day] 기간의 날짜/검사별 (날짜, 검사 종류, 횟수, 평균, 최소, 최대)"""
+        start, _ = _day_bounds(start_day)
+        _, end = _day_bounds(end_day)
+        self._sync_pending()
+        with self._connection() as conn:
+            return conn.execute('''
+                SELECT date(created_at, 'unixepoch', 'localtime') AS day, test_type,
+                       COUNT(*), AVG(result), MIN(result), MAX(result)
+                FROM diagnoses
+                WHERE user_id = ? AND created_at >= ? AND created_at < ?
+                GROUP BY day, test_type
+                ORDER BY day, test_type
+            ''', (user_id, start, end)).fetchall()
@@ -1,77 +1,198 @@
+from functools import lru_cache
+from types import MappingProxyType
+
+# 운동 카탈로그 (regions: 주로 사용하는 부위, types: 특히 권장하는 척추측만증 형태, None이면 모든 형태)
+EXERCISE_CATALOG = (
+    {
+        'name': '벽 스트레칭',
+        'description': '벽에 등을 대고 서서 양팔을 벽을 따라 천천히 올렸다 내립니다.',
+        'minutes': 5,
+        'level': 'basic',
+        'regions': ('흉추', '어깨'),
+        'types': None,
+        'image': 'wall_stretch.jpg'
+    },
+    {
+        'name': '고양이 자세',
+        'description': '무릎을 대고 엎드린 자세에서 등을 둥글게 말았다 펴는 동작을 반복합니다.',
+        'minutes': 3,
+        'level': 'basic',
+        'regions': ('흉추', '요추'),
+        'types': None,
+        'image': 'cat_pose.jpg'
+    },
+    {
+        'name': '코브라 자세',
+        'description': '엎드린 자세에서 상체를 들어올려 척추를 늘립니다.',
+        'minutes': 5,
+        'level': 'intermediate',
+        'regions': ('요추', '흉추'),
+        'types': None,
+        'image': 'cobra_pose.jpg'
+    },
+    {
+        'name': '사이드 플랭크',
+        'description': '한쪽 팔꿈치를 대고 몸을 일자로 유지합니다.',
+        'minutes': 3,
+        'level': 'intermediate',
+        'regions': ('코어', '요추'),
+        'types': ('C형', '복합형'),
+        'image': 'side_plank.jpg'
+    },
+    {
+        'name': '브릿지',
+        'description': '누운 자세에서 엉덩이를 들어올려 척추를 늘립니다.',
+        'minutes': 5,
+        'level': 'advanced',
+        'regions': ('요추', '골반'),
+        'types': None,
+        'image': 'bridge.jpg'
+    },
+    {
+        'name': '슈퍼맨 자세',
+        'description': '엎드린 자세에서 양팔과 양다리를 들어올립니다.',
+        'minutes': 3,
+        'level': 'advanced',
+        'regions': ('흉추', '요추', '코어'),
+        'types': None,
+        'image': 'superman.jpg'
+    },
+)
+
+# 난이도 순서와 표시 이름
+LEVELS = ('basic', 'intermediate', 'advanced')
+DIFFICULTY_LABELS = {'basic': '초급', 'intermediate': '중급', 'advanced': '고급'}
+SCOLIOSIS_TYPES = ('C형', 'S형', '복합형')
+# 곡률 상한별 운동 난이도
+CURVATURE_LEVELS = ((0.1, 'basic'), (0.2, 'intermediate'))
+
+
+def _freeze(exercise):
+    entry = dict(exercise)
+    entry['duration'] = f"{exercise['minutes']}분"
+    entry['difficulty'] = DIFFICULTY_LABELS[exercise['level']]
+    return MappingProxyType(entry)
+
+
+def _compile_catalog(catalog):
+    # 카탈로그를 읽기 전용 항목과 난이도/부위/형태/시간별 인덱스로 한 번만 변환
+    entries = tuple(_freeze(exercise) for exercise in catalog)
+    by_level, by_region, by_type, by_minutes = {}, {}, {}, {}
+    for entry in entries:
+        by_level.setdefault(entry['level'], []).append(entry)
+        for region in entry['regions']:
+            by_region.setdefault(region, []).append(entry)
+        for scoliosis_type in entry['types'] or SCOLIOSIS_TYPES:
+            by_type.setdefault(scoliosis_type, []).append(entry)
+        by_minutes.setdefault(entry['minutes'], []).append(entry)
+
+    def freeze_index(index):
+        return MappingProxyType({key: tuple(values) for key, values in index.items()})
+
+    return MappingProxyType({
+        'entries': entries,
+        'by_name': MappingProxyType({entry['name']: entry for entry in entries}),
+        'by_level': freeze_index(by_level),
+        'by_region': freeze_index(by_region),
+        'by_type': freeze_index(by_type),
+        'by_minutes': freeze_index(by_minutes),
+    })
+
+
+CATALOG = _compile_catalog(EXERCISE_CATALOG)
+
+
+def parse_minutes(duration):
+    """'30분' 또는 30 형태의 운동 시간을 분 단위 정수로 변환하는 함수"""
+    if isinstance(duration, str):
+        duration = duration.strip().rstrip('분').strip()
+    return int(duration)
+
+
+def curvature_level(curvature):
+    """곡률에 맞는 운동 난이도 ('basic', 'intermediate', 'advanced')"""
+    for limit, level in CURVATURE_LEVELS:
+        if curvature < limit:
+            return level
+    return LEVELS[-1]
+
+
+@lru_cache(maxsize=256)
+def _build_program(level, scoliosis_type, minutes, recent):
+    # 대상 난이도 운동을 먼저, 그 아래 난이도는 남는 시간에 배정하고
+    # 같은 난이도에서는 형태에 특히 권장되는 운동, 최근에 하지 않은 운동 순으로 우선 배정
+    allowed = None
+    if scoliosis_type in CATALOG['by_type']:
+        allowed = {entry['name'] for entry in CATALOG['by_type'][scoliosis_type]}
+    target = LEVELS.index(level)
+    candidates = [
+        entry for candidate_level in LEVELS[:target + 1]
+        for entry in CATALOG['by_level'].get(candidate_level, ())
+        if allowed is None or entry['name'] in allowed
+    ]
+    candidates.sort(key=lambda entry: (
+        -LEVELS.index(entry['level']),
+        entry['types'] is None,
+        entry['name'] in recent,
+    ))
+
+    # 시간 예산 안에서 우선순위 순서로 한 세트씩 돌아가며 추가
+    sets = dict.fromkeys((entry['name'] for entry in candidates), 0)
+    remaining = minutes
+    added = True
+    while added:
+        added = False
+        for entry in candidates:
+            if entry['minutes'] <= remaining:
+                sets[entry['name']] += 1
+                remaining -= entry['minutes']
+                added = True
+
+    # 쉬운 운동부터 진행하도록 난이도 순으로 정렬
+    program = []
+    for entry in sorted(candidates, key=lambda entry: LEVELS.index(entry['level'])):
+        count = sets[entry['name']]
+        if not count:
+            continue
+        item = dict(entry)
+        item['sets'] = count
+        item['total_minutes'] = entry['minutes'] * count
+        if count > 1:
+            item['duration'] = f"{item['total_minutes']}분 ({entry['duration']} x {count}세트)"
+        program.append(MappingProxyType(item))
+    return tuple(program)
+
+
 class ExerciseGuide:
     def __init__(self):
-        self.exercises = {
-            'basic': [
-                {
-                    'name': '벽 스트레칭',
-                    'description': '벽에 등을 대고 서서 양팔을 벽을 따라 천천히 올렸다 내립니다.',
-                    'duration': '5분',
-                    'difficulty': '초급',
-                    'image': 'wall_stretch.jpg'
-                },
-                {
-                    'name': '고양이 자세',
-                    'description': '무릎을 대고 엎드린 자세에서 등을 둥글게 말았다 펴는 동작을 반복합니다.',
-                    'duration': '3분',
-                    'difficulty': '초급',
-                    'image': 'cat_pose.jpg'
-                }
-            ],
-            'intermediate': [
-                {
-                    'name': '코브라 자세',
-                    'description': '엎드린 자세에서 상체를 들어올려 척추를 늘립니다.',
-                    'duration': '5분',
-                    'difficulty': '중급',
-                    'image': 'cobra_pose.jpg'
-                },
-                {
-                    'name': '사이드 플랭크',
-                    'description': '한쪽 팔꿈치를 대고 몸을 일자로 유지합니다.',
-                    'duration': '3분',
-                    'difficulty': '중급',
-                    'image': 'side_plank.jpg'
-                }
-            ],
-            'advanced': [
-                {
-                    'name': '브릿지',
-                    'description': '누운 자세에서 엉덩이를 들어올려 척추를 늘립니다.',
-                    'duration': '5분',
-                    'difficulty': '고급',
-                    'image': 'bridge.jpg'
-                },
-                {
-                    'name': '슈퍼맨 자세',
-                    'description': '엎드린 자세에서 양팔과 양다리를 들어올립니다.',
-                    'duration': '3분',
-                    'difficulty': '고급',
-                    'image': 'superman.jpg'
-                }
-            ]
-        }
+        # 난이도별 운동 목록 (읽기 전용)
+        self.exercises = CATALOG['by_level']
 
     def get_exercises_by_level(self, level):
-        return self.exercises.get(level, [])
+        return self.exercises.get(level, ())
 
     def get_exercises_by_curvature(self, curvature):
-        if curvature < 0.1:
-            return self.exercises['basic']
-        elif curvature < 0.2:
-            return self.exercises['intermediate']
-        else:
-            return self.exercises['advanced']
-
-    def get_exercise_program(self, curvature, duration):
-        exercises = self.get_exercises_by_curvature(curvature)
-        program = []
-        
-        for exercise in exercises:
-            program.append({
-                'name': exercise['name'],
-                'description': exercise['description'],
-                'duration': exercise['duration'],
-                'difficulty': exercise['difficulty']
-            })
-        
-        return program 
\ No newline at end of file
+        return self.exercises[curvature_level(curvature)]
+
+    def find_exercises(self, level=None, region=None, scoliosis_type=None, minutes=None):
+        """조건에 맞는 운동 목록 (지정하지 않은 조건은 무시)"""
+        result = None
+        for index, key in (('by_level', level), ('by_region', region),
+                           ('by_type', scoliosis_type), ('by_minutes', minutes)):
+            if key is None:
+                continue
+            matches = CATALOG[index].get(key, ())
+            if result is None:
+                result = matches
+            else:
+                names = {entry['name'] for entry in matches}
+                result = tuple(entry for entry in result if entry['name'] in names)
+        return CATALOG['entries'] if result is None else result
+
+    def get_exercise_program(self, curvature, duration, scoliosis_type=None, recent_exercises=()):
+        """곡률 난이도, 척추측만증 형태, 최근 운동 기록으로 시간 예산(duration)에 맞춘 운동 프로그램
+
+        같은 (난이도, 형태, 시간, 최근 운동) 조합의 결과는 메모이즈된 읽기 전용 항목을 그대로 반환합니다.
+        """
+        recent = frozenset(recent_exercises) & frozenset(CATALOG['by_name'])
+        return _build_program(curvature_level(curvature), scoliosis_type, parse_minutes(duration), recent)
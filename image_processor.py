@@ -2,140 +2,656 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from instrumentation import metrics
+from result_cache import MISSING, content_hash
+
+# 분석 알고리즘/파라미터 버전 (임계값이나 정규화 방식을 바꾸면 올려서 캐시를 무효화)
+ANALYSIS_VERSION = 1
+
+# 등록된 분석기 (이름은 diagnoses.test_type 값과 동일, register_analyzer로 추가)
+ANALYZERS = {}
+# 분석기가 선언할 수 있는 공유 입력 ('image': 원본 입력, 'gray': 디코딩한 그레이스케일,
+# 'preprocessed': preprocess()의 중간 결과, 'quality': check_quality()의 품질 검사 결과)
+ANALYZER_INPUTS = ('image', 'gray', 'preprocessed', 'quality')
+# 촬영 자세별 (탭 제목, 안내 문구), 같은 사진을 쓰는 분석기는 한 번의 업로드로 함께 실행
+PHOTO_GUIDES = {
+    'bent_forward': ("아담스 테스트", "앞으로 굽혀서 등 사진을 업로드해주세요."),
+    'standing': ("기본 자세 체크", "기본 자세 체크를 위한 사진을 업로드해주세요."),
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# 품질 검사 결과 (통과, 경고 후 분석, 분석하지 않고 거부)
+QUALITY_OK = 'ok'
+QUALITY_WARN = 'warn'
+QUALITY_REJECT = 'reject'
+# 품질 검사용 썸네일 크기 (긴 변 기준 픽셀, 기준값은 이 크기에서 측정한 값)
+QUALITY_DIMENSION = 256
+# 품질 지표별 (거부 기준, 경고 기준), None이면 해당 단계를 검사하지 않음
+QUALITY_THRESHOLDS = {
+    # 라플라시안 분산 (낮을수록 흐림)
+    'sharpness': (20.0, 50.0),
+    # 평균 밝기 하한/상한 (0-255)
+    'min_brightness': (25.0, 50.0),
+    'max_brightness': (240.0, 220.0),
+    # 검은색/흰색으로 포화된 픽셀 비율
+    'clipped': (0.7, 0.35),
+    # 밝기 표준편차 (피사체 없이 단색에 가까우면 낮음)
+    'contrast': (10.0, 20.0),
+    # 몸통 영역이 프레임에서 차지하는 비율
+    'subject': (None, 0.05),
+}
+QUALITY_MESSAGES = {
+    'sharpness': "사진이 흐립니다. 초점을 맞춰 흔들리지 않게 다시 촬영해주세요.",
+    'min_brightness': "사진이 너무 어둡습니다. 밝은 곳에서 다시 촬영해주세요.",
+    'max_brightness': "사진이 너무 밝습니다. 역광이나 직사광을 피해 다시 촬영해주세요.",
+    'clipped': "노출이 맞지 않아 사진의 많은 부분이 검거나 하얗게 보입니다.",
+    'contrast': "사진에서 사람을 구분하기 어렵습니다. 배경과 대비되는 옷이나 벽 앞에서 촬영해주세요.",
+    'subject': "사람이 너무 작게 찍혔습니다. 몸 전체가 화면을 채우도록 가까이에서 촬영해주세요.",
+    'no_subject': "사진에서 몸통 영역을 찾지 못했습니다. 단순한 배경 앞에서 촬영해주세요.",
+}
+# 자세 분석 엔진 ('opencv': 영역 평균 휴리스틱, 'landmark': MediaPipe Pose 랜드마크)
+POSTURE_ENGINES = ('opencv', 'landmark')
+# 윤곽선 탐색 방식
+SEARCH_MODES = ('full', 'roi')
+# 인코딩된 이미지로 받는 입력 형식 (업로드 바이트, 메모리 맵 등)
+BUFFER_TYPES = (bytes, bytearray, memoryview)
+# 축소 디코딩 배율별 플래그 (JPEG은 DCT 단계에서 축소하므로 전체 해상도 프레임을 만들지 않음)
+_REDUCED_FLAGS = {
+    True: ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+           (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)),
+    False: ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+            (2, cv2.IMREAD_REDUCED_COLOR_2)),
+}
+
+# 워커 프로세스마다 한 번만 생성되는 ImageProcessor
+_worker_processor = None
+
+def _init_batch_worker(max_dimension, options):
+    global _worker_processor
+    _worker_processor = ImageProcessor(max_dimension=max_dimension, **options)
+
+def _process_batch_item(args):
+    kind, image, image_store = args
+    processor = _worker_processor or ImageProcessor()
+    return processor._process_one(kind, image, image_store=image_store)
+
+def _analyze_batch_item(args):
+    processor = _worker_processor or ImageProcessor()
+    try:
+        return processor.analyze(*args)
+    finally:
+        processor.clear_cache()
+
+class Analyzer:
+    """등록된 분석 하나의 선언
+
+    run(processor, inputs, content_key, **options)은 AnalysisInputs에서 inputs에 선언한
+    공유 입력을 꺼내 결과를 반환하고, score(result)는 diagnoses.result에 저장할 단일 값을 계산합니다.
+    version을 올리면 이 분석기의 캐시된 결과만 무효화됩니다.
+    fields는 결과 딕셔너리의 {키: 표시 이름}, options는 {옵션: (표시 이름, {선택지 이름: 값})}이며
+    alert_rate는 진행 경고를 띄울 일일 증가량입니다 (None이면 경고하지 않음).
+    """
+
+    def __init__(self, name, label, run, inputs=('preprocessed',), version=ANALYSIS_VERSION, score=None,
+                 photo=None, score_label=None, fields=None, options=None, alert_rate=None):
+        unknown = set(inputs) - set(ANALYZER_INPUTS)
+        if unknown:
+            raise ValueError(f"Unknown analyzer inputs: {sorted(unknown)}")
+        self.name = name
+        self.label = label
+        self.inputs = tuple(inputs)
+        self.version = version
+        # 촬영 자세 (PHOTO_GUIDES의 키, 없으면 분석기마다 별도 업로드)
+        self.photo = photo or name
+        self.score_label = score_label or label
+        self.fields = dict(fields or {})
+        self.options = dict(options or {})
+        self.alert_rate = alert_rate
+        self._run = run
+        self._score = score
+
+    def run(self, processor, inputs, content_key=None, **options):
+        return self._run(processor, inputs, content_key, **options)
+
+    def score(self, result):
+        if result is None:
+            return None
+        return self._score(result) if self._score else result
+
+class AnalysisInputs:
+    """한 이미지에 실행하는 분석기들이 공유하는 입력
+
+    중간 결과는 처음 요청한 분석기가 한 번만 계산하고, 동시에 요청한 다른 분석기는 기다렸다가 재사용합니다.
+    """
+
+    def __init__(self, processor, image):
+        self.processor = processor
+        self.image = image
+        self._values = {'image': image}
+        # 'preprocessed'와 'quality'는 계산 중에 'gray'를 요청하므로 재진입 가능한 잠금 사용
+        self._lock = threading.RLock()
+
+    def get(self, name):
+        if name not in ANALYZER_INPUTS:
+            raise ValueError(f"Unknown analyzer input: {name}")
+        value = self._values.get(name, MISSING)
+        if value is MISSING:
+            with self._lock:
+                value = self._values.get(name, MISSING)
+                if value is MISSING:
+                    value = self._build(name)
+                    self._values[name] = value
+        return value
+
+    def _build(self, name):
+        image = self.image
+        if name == 'gray':
+            return image['gray'] if isinstance(image, dict) else self.processor._to_gray(image)
+        # 품질 검사와 전처리는 같은 디코딩 결과를 사용 (전처리된 결과(dict)는 그대로 사용)
+        source = image if isinstance(image, dict) else self.get('gray')
+        if name == 'quality':
+            return self.processor.check_quality(source)
+        return self.processor.preprocess(source)
 
 class ImageProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, max_dimension=1024, cache=None, posture_engine='opencv', pose_deadline=None,
+                 search_mode='full', coarse_dimension=256, roi_margin=0.1, quality_gate=False,
+                 quality_thresholds=None):
+        if posture_engine not in POSTURE_ENGINES:
+            raise ValueError(f"Unknown posture engine: {posture_engine}")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        # 이진화 전에 축소할 작업 해상도 (긴 변 기준 픽셀, None이면 원본 크기 사용)
+        self.max_dimension = max_dimension
+        # 분석 결과 캐시 (result_cache.ResultCache, None이면 사용하지 않음)
+        self.cache = cache
+        # 기본 자세 분석 엔진
+        self.posture_engine = posture_engine
+        # 랜드마크 추론 제한 시간(초), 넘기면 OpenCV 휴리스틱으로 대체 (None이면 제한 없음)
+        self.pose_deadline = pose_deadline
+        # 윤곽선 탐색 방식 ('full': 전체 프레임, 'roi': 축소 이미지에서 몸통 영역을 찾은 뒤 그 영역만 정밀 분석)
+        self.search_mode = search_mode
+        # 'roi' 모드에서 몸통 위치를 찾을 축소 해상도와 영역 주변 여백 비율
+        self.coarse_dimension = coarse_dimension
+        self.roi_margin = roi_margin
+        # 분석 전에 썸네일로 흐림/노출/피사체 크기를 검사하여 분석할 수 없는 사진을 거부할지 여부
+        self.quality_gate = quality_gate
+        # QUALITY_THRESHOLDS 중 바꿀 기준값
+        self.quality_thresholds = dict(QUALITY_THRESHOLDS, **(quality_thresholds or {}))
+        # 마지막으로 전처리한 (이미지, 중간 결과) (같은 이미지로 여러 분석 시 재사용)
+        # 여러 세션이 공유해도 안전하도록 하나의 튜플로 교체
+        self._preprocess_cache = None
+
+    def preprocess(self, image):
+        """이미지를 한 번만 전처리하여 이진 마스크와 윤곽선을 반환하는 함수
+
+        같은 이미지 객체로 다시 호출하면 캐시된 중간 결과를 그대로 반환합니다.
+        이미 전처리된 결과(dict)를 넘기면 그대로 반환합니다.
+        인코딩된 바이트(bytes, memoryview)는 작업 해상도 그레이스케일로 바로 디코딩합니다.
+        """
+        if isinstance(image, dict):
+            return image
+        if isinstance(image, AnalysisInputs):
+            return image.get('preprocessed')
+        cached = self._preprocess_cache
+        if cached is not None and cached[0] is image:
+            return cached[1]
+
+        # 그레이스케일 변환 (PIL 이미지는 BGR 변환 없이 바로 변환)
+        with metrics.timer('image.grayscale'):
+            gray = self._to_gray(image)
+
+        # 몸통 영역만 잘라서 분석 (찾지 못하면 전체 프레임 사용)
+        roi = None
+        if self.search_mode == 'roi':
+            with metrics.timer('image.roi'):
+                roi = self.locate_roi(gray)
+            if roi is not None:
+                x, y, w, h = roi
+                gray = gray[y:y+h, x:x+w]
+            else:
+                metrics.increment('image.roi_not_found')
+
+        # 작업 해상도로 축소
+        with metrics.timer('image.resize'):
+            gray, scale = self._resize_to_working(gray)
+
+        with metrics.timer('image.threshold'):
+            binary = self._threshold(gray)
+        with metrics.timer('image.morphology'):
+            binary = self._denoise(binary)
+        with metrics.timer('image.contours'):
+            contours, max_contour = self._find_contours(binary)
+        if max_contour is None:
+            metrics.increment('image.no_contour')
+
+        preprocessed = {
+            'gray': gray,
+            'binary': binary,
+            'contours': contours,
+            'max_contour': max_contour,
+            'scale': scale,
+            'roi': roi
+        }
+        self._preprocess_cache = (image, preprocessed)
+        return preprocessed
+
+    def _worker_options(self):
+        # 워커 프로세스의 ImageProcessor를 같은 설정으로 만들기 위한 인자
+        return {'search_mode': self.search_mode, 'coarse_dimension': self.coarse_dimension,
+                'roi_margin': self.roi_margin, 'quality_gate': self.quality_gate,
+                'quality_thresholds': self.quality_thresholds}
+
+    def _search_key(self):
+        # 탐색 방식에 따라 결과가 달라지므로 캐시 키에 포함
+        if self.search_mode == 'full':
+            return 'full'
+        return f"roi{self.coarse_dimension}m{self.roi_margin}"
+
+    def locate_roi(self, gray):
+        """축소한 이미지에서 몸통 영역을 찾아 원본 좌표의 (x, y, w, h)로 반환하는 함수
+
+        Otsu 이진화로 배경과 구분되는 가장 큰 영역을 찾고 roi_margin만큼 여백을 더합니다.
+        영역이 프레임 대부분을 차지하거나 찾지 못하면 None을 반환합니다.
+        """
+        height, width = gray.shape[:2]
+        # 전체 프레임을 리샘플링하지 않도록 일정 간격으로 픽셀을 건너뛰어 축소
+        step = max(1, -(-max(height, width) // self.coarse_dimension))
+        scale = 1.0 / step
+        bbox = _find_subject(np.ascontiguousarray(gray[::step, ::step]))
+        if bbox is None:
+            return None
 
-    def process_adams_test(self, image):
+        # 원본 좌표로 변환하고 여백 추가
+        x, y, w, h = bbox
+        margin_x = int(w * self.roi_margin / scale)
+        margin_y = int(h * self.roi_margin / scale)
+        x0 = max(0, int(x / scale) - margin_x)
+        y0 = max(0, int(y / scale) - margin_y)
+        x1 = min(width, int((x + w) / scale) + margin_x)
+        y1 = min(height, int((y + h) / scale) + margin_y)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def check_quality(self, image):
+        """썸네일로 흐림, 노출, 피사체 크기를 빠르게 검사하는 함수
+
+        {'status': 'ok' | 'warn' | 'reject', 'reasons': [...], 'metrics': {...}}를 반환하며,
+        reasons의 각 항목은 {'code', 'severity', 'value', 'threshold', 'message'}입니다.
+        전처리된 결과(dict)처럼 원본을 알 수 없는 입력은 검사하지 않고 'ok'를 반환합니다.
+        """
+        if isinstance(image, dict):
+            return {'status': QUALITY_OK, 'reasons': [], 'metrics': {}}
+
+        with metrics.timer('image.quality'):
+            thumbnail = self._quality_thumbnail(image)
+            bbox = _find_subject(thumbnail)
+            height, width = thumbnail.shape[:2]
+            values = {
+                'sharpness': float(cv2.Laplacian(thumbnail, cv2.CV_64F).var()),
+                'min_brightness': float(thumbnail.mean()),
+                'max_brightness': float(thumbnail.mean()),
+                'clipped': float(np.count_nonzero((thumbnail < 16) | (thumbnail > 239)) / thumbnail.size),
+                'contrast': float(thumbnail.std()),
+                'subject': bbox[2] * bbox[3] / float(width * height) if bbox is not None else None,
+            }
+
+            reasons = []
+            for code, value in values.items():
+                if value is None:
+                    continue
+                # max_brightness와 clipped는 값이 클수록 나쁨
+                higher_is_worse = code in ('max_brightness', 'clipped')
+                for severity, threshold in zip((QUALITY_REJECT, QUALITY_WARN), self.quality_thresholds[code]):
+                    if threshold is None:
+                        continue
+                    if (value > threshold) if higher_is_worse else (value < threshold):
+                        reasons.append({'code': code, 'severity': severity, 'value': value,
+                                        'threshold': threshold, 'message': QUALITY_MESSAGES[code]})
+                        break
+            if bbox is None:
+                reasons.append({'code': 'no_subject', 'severity': QUALITY_WARN, 'value': None,
+                                'threshold': None, 'message': QUALITY_MESSAGES['no_subject']})
+
+        severities = {reason['severity'] for reason in reasons}
+        status = QUALITY_REJECT if QUALITY_REJECT in severities else QUALITY_WARN if severities else QUALITY_OK
+        if status != QUALITY_OK:
+            metrics.increment(f'image.quality.{status}')
+        return {'status': status, 'reasons': reasons, 'metrics': values}
+
+    def _quality_thumbnail(self, image):
+        # 품질 검사용 그레이스케일 썸네일 (인코딩된 바이트는 축소 디코딩하여 전체 해상도를 만들지 않음)
+        if isinstance(image, BUFFER_TYPES):
+            gray = decode_image(image, QUALITY_DIMENSION)
+        elif isinstance(image, Image.Image):
+            # reduce()는 'P', '1', 'I;16' 모드를 지원하지 않으므로 먼저 그레이스케일로 변환
+            if image.mode != 'L':
+                image = image.convert('L')
+            gray = np.array(image.reduce(max(1, max(image.size) // QUALITY_DIMENSION)))
+        else:
+            # 큰 배열은 먼저 건너뛰어 줄인 뒤 영역 평균으로 축소 (앨리어싱으로 선명도가 부풀려지지 않도록 2배 여유)
+            step = max(1, max(image.shape[:2]) // (2 * QUALITY_DIMENSION))
+            gray = self._to_gray(np.ascontiguousarray(image[::step, ::step]))
+        height, width = gray.shape[:2]
+        if max(height, width) <= QUALITY_DIMENSION:
+            return gray
+        scale = QUALITY_DIMENSION / float(max(height, width))
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    def _threshold(self, gray):
+        # 이미지 전처리
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        # 적응형 이진화 적용
+        return cv2.adaptiveThreshold(
+            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY, 11, 2
+        )
+
+    def _denoise(self, binary):
+        # 노이즈 제거
+        kernel = np.ones((3,3), np.uint8)
+        return cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+
+    def _find_contours(self, binary):
+        # 윤곽선 검출
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # 가장 큰 윤곽선 찾기
+        max_contour = max(contours, key=cv2.contourArea) if contours else None
+        return contours, max_contour
+
+    def clear_cache(self):
+        """캐시된 전처리 결과를 비우는 함수"""
+        self._preprocess_cache = None
+
+    def _to_gray(self, image):
+        if isinstance(image, BUFFER_TYPES):
+            # ROI 탐색은 잘라낸 영역을 정밀 분석하므로 원본 해상도로 디코딩
+            max_dimension = self.max_dimension if self.search_mode == 'full' else None
+            with metrics.timer('image.decode'):
+                return decode_image(image, max_dimension)
+        if isinstance(image, Image.Image):
+            if image.mode != 'L':
+                image = image.convert('RGB')
+            image = np.array(image)
+            if image.ndim == 3:
+                return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            return image
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def _resize_to_working(self, gray):
+        height, width = gray.shape[:2]
+        longest = max(height, width)
+        if not self.max_dimension or longest <= self.max_dimension:
+            return gray, 1.0
+        scale = self.max_dimension / float(longest)
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+    def process_adams_test(self, image, content_key=None):
+        """아담스 테스트 곡률을 계산하는 함수
+
+        content_key에 업로드 파일의 해시를 넘기면 이미지 해시 계산을 생략합니다.
+        """
+        return self.run_analyzer('adams_test', image, content_key)
+
+    def process_posture(self, image, content_key=None, engine=None, deadline=None):
+        """어깨/골반/척추 정렬 지표를 계산하는 함수
+
+        engine으로 요청마다 분석 엔진을 선택할 수 있습니다 (기본값: self.posture_engine).
+        'landmark' 엔진이 deadline(초) 안에 끝나지 않거나 mediapipe가 없으면
+        OpenCV 휴리스틱 결과를 반환합니다.
+        """
+        return self.run_analyzer('posture_check', image, content_key, engine=engine, deadline=deadline)
+
+    def run_analyzer(self, kind, image, content_key=None, **options):
+        """등록된 분석기 하나를 실행하여 결과를 반환하는 함수 (image는 이미지 또는 AnalysisInputs)
+
+        quality_gate가 켜져 있으면 품질 검사에서 거부된 사진은 분석하지 않고 None을 반환합니다.
+        """
+        analyzer = get_analyzer(kind)
+        inputs = image if isinstance(image, AnalysisInputs) else AnalysisInputs(self, image)
+        if content_key is None and self.cache is not None and not isinstance(inputs.image, dict):
+            content_key = content_hash(inputs.image)
+        if self.quality_gate and self._quality(inputs, content_key)['status'] == QUALITY_REJECT:
+            return None
+        return analyzer.run(self, inputs, content_key, **options)
+
+    def analyze(self, image, kinds=None, content_key=None, options=None):
+        """한 이미지에 여러 분석기를 동시에 실행하는 함수
+
+        전처리 같은 공유 중간 결과는 한 번만 계산하며, 분석 종류마다
+        {'result', 'score', 'error'} 딕셔너리를 반환합니다 (kinds가 없으면 등록된 전체).
+        options는 {분석 종류: {옵션: 값}}입니다 (예: {'posture_check': {'engine': 'landmark'}}).
+        quality_gate가 켜져 있으면 먼저 품질 검사를 하고 결과를 항목마다 'quality'에 담으며,
+        거부된 사진은 분석하지 않고 거부 사유를 error로 반환합니다.
+        """
+        analyzers = [get_analyzer(kind) for kind in (kinds or ANALYZERS)]
+        options = options or {}
+        if isinstance(image, (str, os.PathLike)):
+            # 인코딩된 바이트를 넘겨 필요한 해상도와 색상으로만 디코딩
+            with open(image, 'rb') as f:
+                image = f.read()
+        # 분석기마다 이미지 해시를 다시 계산하지 않도록 한 번만 계산
+        if content_key is None and self.cache is not None and not isinstance(image, dict):
+            content_key = content_hash(image)
+        inputs = AnalysisInputs(self, image)
+
+        if self.quality_gate:
+            quality = self._quality(inputs, content_key)
+            if quality['status'] == QUALITY_REJECT:
+                error = ' '.join(reason['message'] for reason in quality['reasons']
+                                 if reason['severity'] == QUALITY_REJECT)
+                return {analyzer.name: {'result': None, 'score': None, 'error': error, 'quality': quality}
+                        for analyzer in analyzers}
+            return {kind: dict(item, quality=quality)
+                    for kind, item in self._analyze(analyzers, inputs, content_key, options).items()}
+        return self._analyze(analyzers, inputs, content_key, options)
+
+    def _analyze(self, analyzers, inputs, content_key, options):
+        if len(analyzers) == 1:
+            analyzer = analyzers[0]
+            return {analyzer.name: self._run_item(analyzer, inputs, content_key, options.get(analyzer.name))}
+        # OpenCV 연산은 GIL을 놓으므로 스레드로 병렬 실행
+        with ThreadPoolExecutor(max_workers=len(analyzers), thread_name_prefix='analyzer') as executor:
+            futures = {
+                analyzer.name: executor.submit(self._run_item, analyzer, inputs, content_key,
+                                               options.get(analyzer.name))
+                for analyzer in analyzers
+            }
+        return {kind: future.result() for kind, future in futures.items()}
+
+    def _quality(self, inputs, content_key):
+        # 품질 판정도 내용 해시로 캐시하여 캐시 적중 시 디코딩과 검사를 생략
+        return self._cached('quality', inputs.image, content_key, lambda image: inputs.get('quality'))
+
+    def _run_item(self, analyzer, inputs, content_key, options):
+        item = {'result': None, 'score': None, 'error': None}
         try:
-            # 이미지를 OpenCV 형식으로 변환
-            if isinstance(image, Image.Image):
-                image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # 이미지 크기 조정
-            height, width = image.shape[:2]
-            image = cv2.resize(image, (width, height))
-            
-            # 이미지 전처리
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            
-            # 적응형 이진화 적용
-            binary = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            
-            # 노이즈 제거
-            kernel = np.ones((3,3), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-            
-            # 윤곽선 검출
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                # 가장 큰 윤곽선 찾기
-                max_contour = max(contours, key=cv2.contourArea)
-                
-                # 윤곽선의 중심선 추출
-                epsilon = 0.02 * cv2.arcLength(max_contour, True)
-                approx = cv2.approxPolyDP(max_contour, epsilon, True)
-                
-                # 곡률 계산
-                if len(approx) >= 3:
-                    return self._calculate_curvature(approx)  # 최대값 제한 제거
+            with metrics.timer(f'analysis.{analyzer.name}'):
+                result = analyzer.run(self, inputs, content_key, **(options or {}))
+            if result is None:
+                item['error'] = '분석 실패'
+            item['result'] = result
+            item['score'] = analyzer.score(result)
+        except Exception as e:
+            item['error'] = str(e)
+        return item
+
+    def _landmark_posture(self, inputs, content_key, deadline):
+        from pose_engine import get_pose_engine, is_available, to_rgb
+
+        image = inputs.image
+        if not is_available() or isinstance(image, dict):
+            return self.run_analyzer('posture_check', inputs, content_key, engine='opencv')
+
+        def analyze(image):
+            if isinstance(image, BUFFER_TYPES):
+                image = decode_image(image, self.max_dimension, grayscale=False)
+            rgb = to_rgb(image)
+            rgb, _ = self._resize_to_working(rgb)
+            try:
+                return get_pose_engine().analyze(rgb, deadline=deadline)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                print(f"Error in process_posture: {str(e)}")
+                return None
+
+        try:
+            return self._cached('posture_landmark', image, content_key, analyze)
+        except TimeoutError:
+            # 제한 시간 초과 시 결과를 캐시하지 않고 OpenCV 휴리스틱으로 대체
+            return self.run_analyzer('posture_check', inputs, content_key, engine='opencv')
+
+    def _cached(self, kind, image, content_key, analyze):
+        if self.cache is None or (content_key is None and isinstance(image, dict)):
+            return analyze(image)
+
+        if content_key is None:
+            content_key = content_hash(image)
+        version = ANALYZERS[kind].version if kind in ANALYZERS else ANALYSIS_VERSION
+        key = f"{kind}:v{version}:{self.max_dimension}:{self._search_key()}:{content_key}"
+
+        result = self.cache.get(key)
+        if result is MISSING:
+            result = analyze(image)
+            # 실패한 분석은 저장하지 않고 다음 요청에서 다시 시도
+            if result is not None:
+                self.cache.set(key, result)
+        # 캐시된 딕셔너리가 호출자에 의해 변경되지 않도록 복사본 반환
+        return dict(result) if isinstance(result, dict) else result
+
+    def _adams_test(self, image):
+        try:
+            preprocessed = self.preprocess(image)
+            max_contour = preprocessed['max_contour']
+
+            if max_contour is not None:
+                with metrics.timer('image.curvature'):
+                    # 윤곽선의 중심선 추출
+                    epsilon = 0.02 * cv2.arcLength(max_contour, True)
+                    approx = cv2.approxPolyDP(max_contour, epsilon, True)
+                    
+                    # 곡률 계산
+                    if len(approx) >= 3:
+                        return self._calculate_curvature(approx)  # 최대값 제한 제거
             
+            metrics.increment('analysis.adams_test.failed')
             return None
         except Exception as e:
+            metrics.increment('analysis.adams_test.failed')
             print(f"Error in process_adams_test: {str(e)}")
             return None
 
-    def process_posture(self, image):
+    def _posture(self, image):
         try:
-            # 이미지를 OpenCV 형식으로 변환
-            if isinstance(image, Image.Image):
-                image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # 이미지 크기 조정
-            height, width = image.shape[:2]
-            image = cv2.resize(image, (width, height))
-            
-            # 이미지 전처리
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            
-            # 적응형 이진화 적용
-            binary = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            
-            # 노이즈 제거
-            kernel = np.ones((3,3), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-            
-            # 윤곽선 검출
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                # 가장 큰 윤곽선 찾기
-                max_contour = max(contours, key=cv2.contourArea)
-                
-                # 윤곽선의 경계 상자 계산
-                x, y, w, h = cv2.boundingRect(max_contour)
+            preprocessed = self.preprocess(image)
+            binary = preprocessed['binary']
+            max_contour = preprocessed['max_contour']
+
+            if max_contour is not None:
+                with metrics.timer('image.posture_metrics'):
+                    # 윤곽선의 경계 상자 계산
+                    x, y, w, h = cv2.boundingRect(max_contour)
                 
-                # 이미지를 4개의 영역으로 나누어 분석
-                top_left = binary[y:y+h//4, x:x+w//2]
-                top_right = binary[y:y+h//4, x+w//2:x+w]
-                bottom_left = binary[y+3*h//4:y+h, x:x+w//2]
-                bottom_right = binary[y+3*h//4:y+h, x+w//2:x+w]
+                    # 이미지를 4개의 영역으로 나누어 분석
+                    top_left = binary[y:y+h//4, x:x+w//2]
+                    top_right = binary[y:y+h//4, x+w//2:x+w]
+                    bottom_left = binary[y+3*h//4:y+h, x:x+w//2]
+                    bottom_right = binary[y+3*h//4:y+h, x+w//2:x+w]
                 
-                # 각 영역의 평균값 계산
-                shoulder_diff = abs(np.mean(top_left) - np.mean(top_right)) / 255.0
-                hip_diff = abs(np.mean(bottom_left) - np.mean(bottom_right)) / 255.0
+                    # 각 영역의 평균값 계산
+                    shoulder_diff = abs(np.mean(top_left) - np.mean(top_right)) / 255.0
+                    hip_diff = abs(np.mean(bottom_left) - np.mean(bottom_right)) / 255.0
                 
-                # 중앙선 분석
-                center_line = binary[y:y+h, x+w//2-5:x+w//2+5]
-                spine_alignment = np.std(center_line) / 255.0
+                    # 중앙선 분석
+                    center_line = binary[y:y+h, x+w//2-5:x+w//2+5]
+                    spine_alignment = np.std(center_line) / 255.0
                 
-                return {
-                    'shoulder_difference': min(shoulder_diff, 1.0),
-                    'hip_difference': min(hip_diff, 1.0),
-                    'spine_alignment': min(spine_alignment, 1.0)
-                }
+                    return {
+                        'shoulder_difference': min(shoulder_diff, 1.0),
+                        'hip_difference': min(hip_diff, 1.0),
+                        'spine_alignment': min(spine_alignment, 1.0)
+                    }
             
+            metrics.increment('analysis.posture_check.failed')
             return None
         except Exception as e:
+            metrics.increment('analysis.posture_check.failed')
             print(f"Error in process_posture: {str(e)}")
             return None
 
+    def process_batch(self, images, kind='adams_test', workers=None, chunksize=4, image_store=None):
+        """여러 이미지를 프로세스 풀에서 일괄 분석하는 함수
+
+        images는 디렉터리 경로, 파일 경로 목록, 인코딩된 바이트 목록 또는 이미지 배열 목록입니다.
+        각 항목마다 {'image', 'result', 'score', 'error'} 딕셔너리를 입력 순서대로 반환하며,
+        한 이미지의 실패는 나머지 분석을 중단시키지 않습니다.
+        image_store가 있으면 워커에서 원본과 썸네일을 저장하고 항목에 'content_hash'를 담습니다.
+        """
+        get_analyzer(kind)
+
+        if isinstance(images, (str, os.PathLike)):
+            images = list_images(images)
+        items = [(kind, image, image_store) for image in images]
+
+        if workers == 1 or len(items) <= 1:
+            return [self._process_one(kind, image, image_store=image_store) for image in images]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(self.max_dimension, self._worker_options())) as executor:
+            return list(executor.map(_process_batch_item, items, chunksize=chunksize))
+
+    def _process_one(self, kind, image, content_key=None, options=None, image_store=None):
+        item = {'image': image if isinstance(image, (str, os.PathLike)) else None}
+        try:
+            if image_store is not None:
+                if isinstance(image, (str, os.PathLike)):
+                    with open(image, 'rb') as f:
+                        image = f.read()
+                if not isinstance(image, BUFFER_TYPES):
+                    raise ValueError("Only encoded images can be stored")
+                # 저장하며 계산한 내용 해시를 분석 캐시 키로 재사용
+                content_key = item['content_hash'] = image_store.put(image)
+            item.update(self.analyze(image, (kind,), content_key, {kind: options})[kind])
+        except Exception as e:
+            item.update(result=None, score=None, error=str(e))
+        finally:
+            # 일괄 처리에서는 이미지마다 새로 분석하므로 캐시를 유지하지 않음
+            self.clear_cache()
+        return item
+
+    @staticmethod
+    def posture_score(posture_data):
+        """자세 분석 결과를 diagnoses.result에 저장할 단일 값으로 변환하는 함수"""
+        return (posture_data['shoulder_difference'] +
+                posture_data['hip_difference'] +
+                posture_data['spine_alignment']) / 3
+
     def _calculate_curvature(self, points):
         try:
+            points = np.asarray(points).reshape(-1, 2)
             if len(points) < 3:
                 return 0
             
-            # 점들을 정렬 (y 좌표 기준)
-            points = sorted(points, key=lambda p: p[0][1])
+            # 점들을 정렬 (y 좌표 기준, 같은 y는 원래 순서 유지)
+            points = points[np.argsort(points[:, 1], kind='stable')]
             
-            # 곡률 계산
-            angles = []
-            max_angle = 0
+            # 모든 연속된 세 점의 회전 각도를 한 번에 계산
+            angles = _turning_angles(points)
             
-            for i in range(len(points) - 2):
-                p1 = points[i][0]
-                p2 = points[i + 1][0]
-                p3 = points[i + 2][0]
-                
-                # 두 벡터 계산
-                v1 = np.array([p2[0] - p1[0], p2[1] - p1[1]])
-                v2 = np.array([p3[0] - p2[0], p3[1] - p2[1]])
-                
-                # 각도 계산 (라디안에서 도수로 변환)
-                cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-                angle = np.arccos(np.clip(cos_angle, -1.0, 1.0)) * 180 / np.pi
-                angles.append(angle)
-                max_angle = max(max_angle, angle)
+            # 길이가 0인 벡터에서 나온 NaN은 무시
+            max_angle = np.nanmax(angles, initial=0.0)
             
             # 최대 각도를 기준으로 곡률 계산 (Cobb 각도와 유사한 방식)
             # 정상: 0-10도, 경도: 10-25도, 중등도: 25-40도, 중증: 40도 이상
@@ -144,4 +660,164 @@ class ImageProcessor:
             
         except Exception as e:
             print(f"Error in _calculate_curvature: {str(e)}")
-            return 0 
+            return 0
+
+    def calculate_curvatures(self, contours):
+        """여러 윤곽선의 곡률을 한 번의 NumPy 연산으로 계산하는 함수
+
+        _calculate_curvature와 같은 값을 윤곽선마다 배열로 반환합니다.
+        점이 3개 미만인 윤곽선은 0입니다.
+        """
+        counts = np.array([len(c) for c in contours], dtype=np.int64)
+        curvatures = np.zeros(len(counts))
+        if not len(counts) or counts.max() < 3:
+            return curvatures
+
+        points = np.concatenate([np.asarray(c).reshape(-1, 2) for c in contours if len(c)])
+        groups = np.repeat(np.arange(len(counts)), counts)
+
+        # 윤곽선별로 y 좌표 기준 정렬 (lexsort는 안정 정렬)
+        order = np.lexsort((points[:, 1], groups))
+        points = points[order]
+
+        angles = _turning_angles(points)
+
+        # 서로 다른 윤곽선에 걸친 세 점과 NaN 각도는 제외
+        valid = (groups[:-2] == groups[2:]) & ~np.isnan(angles)
+        max_angles = np.zeros(len(counts))
+        np.maximum.at(max_angles, groups[:-2][valid], angles[valid])
+
+        # 정상: 0-10도, 경도: 10-25도, 중등도: 25-40도, 중증: 40도 이상
+        curvatures = max_angles / 40.0
+        curvatures[counts < 3] = 0.0
+        return curvatures
+
+def _turning_angles(points):
+    """(N, 2) 점 배열에서 연속된 세 점이 이루는 회전 각도(도)를 계산하는 함수"""
+    vectors = np.diff(points.astype(np.float64), axis=0)
+    v1 = vectors[:-1]
+    v2 = vectors[1:]
+    dots = np.einsum('ij,ij->i', v1, v2)
+    norms = np.hypot(v1[:, 0], v1[:, 1]) * np.hypot(v2[:, 0], v2[:, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_angle = dots / norms
+    return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+def _find_subject(coarse):
+    """축소한 그레이스케일 이미지에서 배경과 구분되는 가장 큰 영역의 (x, y, w, h)를 찾는 함수
+
+    Otsu 이진화로 찾으며, 영역이 프레임 대부분을 차지하거나 너무 작으면 None을 반환합니다.
+    """
+    coarse = cv2.GaussianBlur(coarse, (5, 5), 0)
+    coarse_area = coarse.shape[0] * coarse.shape[1]
+
+    # 피사체가 배경보다 어두운 경우를 먼저 시도하고, 실패하면 밝은 경우를 시도
+    for flags in (cv2.THRESH_BINARY_INV, cv2.THRESH_BINARY):
+        _, mask = cv2.threshold(coarse, 0, 255, flags | cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            continue
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if w * h >= 0.9 * coarse_area or w * h < 0.01 * coarse_area:
+            continue
+        return x, y, w, h
+    return None
+
+def image_size(data):
+    """인코딩된 이미지의 헤더만 읽어 (너비, 높이)를 반환하는 함수 (알 수 없으면 None)"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+def decode_image(data, max_dimension=None, grayscale=True):
+    """인코딩된 바이트를 복사 없이 바로 디코딩하는 함수
+
+    max_dimension이 있으면 긴 변이 그보다 작아지지 않는 가장 큰 축소 배율(1/2, 1/4, 1/8)로
+    디코딩하고, grayscale이면 색상 변환 없이 그레이스케일로 디코딩합니다.
+    """
+    buffer = np.frombuffer(data, np.uint8)
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    if max_dimension:
+        size = image_size(data)
+        if size is not None:
+            for factor, reduced in _REDUCED_FLAGS[grayscale]:
+                if max(size) // factor >= max_dimension:
+                    flags = reduced
+                    break
+    image = cv2.imdecode(buffer, flags)
+    if image is None:
+        raise ValueError("Cannot decode image")
+    return image
+
+def load_image(path):
+    """파일 경로에서 이미지를 BGR 배열로 읽는 함수"""
+    data = np.fromfile(path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot decode image: {path}")
+    return image
+
+def list_images(directory):
+    """디렉터리에서 분석 가능한 이미지 파일 경로를 정렬하여 반환하는 함수"""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def register_analyzer(analyzer):
+    """분석기를 레지스트리에 추가하는 함수 (같은 이름이 있으면 교체)"""
+    ANALYZERS[analyzer.name] = analyzer
+    return analyzer
+
+def get_analyzer(kind):
+    """등록된 분석기를 반환하는 함수 (없으면 ValueError)"""
+    analyzer = ANALYZERS.get(kind)
+    if analyzer is None:
+        raise ValueError(f"Unknown analysis kind: {kind}")
+    return analyzer
+
+def analyzer_label(kind):
+    """분석 종류의 표시 이름 (등록되지 않은 종류는 그대로 반환)"""
+    analyzer = ANALYZERS.get(kind)
+    return analyzer.label if analyzer is not None else kind
+
+def _run_adams_test(processor, inputs, content_key=None):
+    return processor._cached('adams_test', inputs.image, content_key, lambda image: processor._adams_test(inputs))
+
+def _run_posture(processor, inputs, content_key=None, engine=None, deadline=None):
+    engine = engine or processor.posture_engine
+    if engine not in POSTURE_ENGINES:
+        raise ValueError(f"Unknown posture engine: {engine}")
+    if engine == 'landmark':
+        return processor._landmark_posture(inputs, content_key, deadline or processor.pose_deadline)
+    return processor._cached('posture_check', inputs.image, content_key, lambda image: processor._posture(inputs))
+
+def load_plugins(modules=None):
+    """추가 분석기를 등록하는 모듈을 불러오는 함수
+
+    modules가 없으면 SCOLIOSIS_ANALYZERS 환경 변수의 쉼표로 구분한 모듈 이름을 사용하며,
+    모듈을 불러올 때 register_analyzer를 호출하면 UI와 일괄 분석에 자동으로 나타납니다.
+    """
+    if modules is None:
+        modules = os.environ.get('SCOLIOSIS_ANALYZERS', '').split(',')
+    for module in modules:
+        if module.strip():
+            importlib.import_module(module.strip())
+
+register_analyzer(Analyzer(
+    'adams_test', "아담스 테스트", _run_adams_test,
+    photo='bent_forward', score_label="척추 곡률", alert_rate=0.1
+))
+register_analyzer(Analyzer(
+    'posture_check', "기본 자세 체크", _run_posture,
+    inputs=('image', 'preprocessed'), score=ImageProcessor.posture_score, photo='standing',
+    fields={'shoulder_difference': "어깨 높이 차이", 'hip_difference': "골반 기울기",
+            'spine_alignment': "척추 정렬"},
+    options={'engine': ("분석 엔진", {"OpenCV (빠름)": 'opencv', "MediaPipe 랜드마크 (정밀)": 'landmark'})},
+    alert_rate=0.05
+))
+# 워커 프로세스에서도 같은 분석기가 등록되도록 모듈을 불러올 때 플러그인을 불러옴
+load_plugins()
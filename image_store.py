@@ -0,0 +1,108 @@
+import mmap
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from result_cache import content_hash
+
+
+class ImageStore:
+    """업로드 이미지를 내용 해시로 저장하는 디렉터리 기반 저장소
+
+    root/originals/ab/cd/<해시>에 원본 바이트를, root/thumbnails/ab/cd/<해시>.png에
+    작업 해상도로 줄인 무손실 PNG를 저장합니다. 같은 내용은 한 번만 저장됩니다.
+    """
+
+    def __init__(self, root='images', max_dimension=1024):
+        self.root = root
+        # 썸네일 크기 (ImageProcessor의 작업 해상도와 같게 두면 재분석 시 원본을 읽을 필요가 없음)
+        self.max_dimension = max_dimension
+
+    def put(self, data):
+        """이미지 바이트와 썸네일을 저장하고 내용 해시를 반환하는 함수 (이미 있으면 저장하지 않음)"""
+        digest = content_hash(data)
+        # 디코딩할 수 없는 데이터는 원본도 남기지 않도록 썸네일을 먼저 만듦
+        self.put_thumbnail(digest, data)
+        self._put_original(digest, data)
+        return digest
+
+    def put_original(self, data):
+        """원본 바이트만 저장하고 내용 해시를 반환하는 함수
+
+        디코딩하지 않으므로 요청을 처리하는 중에 호출하고, 썸네일은 put_thumbnail로 나중에 만듭니다.
+        """
+        digest = content_hash(data)
+        self._put_original(digest, data)
+        return digest
+
+    def put_thumbnail(self, digest, data):
+        """원본 바이트로 작업 해상도 썸네일을 만들어 저장하는 함수 (이미 있으면 생략)"""
+        path = self.path(digest, thumbnail=True)
+        if os.path.exists(path):
+            return
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Cannot decode image")
+        ok, thumbnail = cv2.imencode('.png', self._shrink(image))
+        if not ok:
+            raise ValueError("Cannot encode thumbnail")
+        self._write(path, thumbnail)
+
+    def _put_original(self, digest, data):
+        original = self.path(digest)
+        if not os.path.exists(original):
+            self._write(original, data)
+
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            return self.put(f.read())
+
+    def exists(self, digest):
+        return bool(digest) and os.path.exists(self.path(digest))
+
+    def path(self, digest, thumbnail=False):
+        if thumbnail:
+            return os.path.join(self.root, 'thumbnails', digest[:2], digest[2:4], digest + '.png')
+        return os.path.join(self.root, 'originals', digest[:2], digest[2:4], digest)
+
+    def load(self, digest, thumbnail=False, grayscale=False):
+        """저장된 이미지를 메모리 맵으로 읽어 디코딩하는 함수 (BGR 또는 그레이스케일 배열)"""
+        flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        with open(self.path(digest, thumbnail), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                buffer = np.frombuffer(mapped, np.uint8)
+                image = cv2.imdecode(buffer, flags)
+                # mmap을 닫기 전에 버퍼 참조를 해제해야 함
+                del buffer
+        if image is None:
+            raise ValueError(f"Cannot decode stored image: {digest}")
+        return image
+
+    def read_bytes(self, digest):
+        with open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def _shrink(self, image):
+        height, width = image.shape[:2]
+        longest = max(height, width)
+        if not self.max_dimension or longest <= self.max_dimension:
+            return image
+        scale = self.max_dimension / float(longest)
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _write(self, path, data):
+        # 임시 파일에 쓴 뒤 이름을 바꿔 동시에 같은 이미지를 저장해도 깨진 파일이 남지 않게 함
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
@@ -0,0 +1,234 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger('scoliosis.metrics')
+
+
+class _NullTimer:
+    """계측이 꺼져 있을 때 사용하는 아무 일도 하지 않는 타이머"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """단계별 타이머와 카운터를 모아 싱크로 내보내는 클래스
+
+    enabled가 False이면 timer()는 공유 no-op 객체를, increment()/observe()는 즉시 반환하므로
+    계측 코드를 남겨 두어도 비용이 거의 없습니다.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.sinks = []
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds, rows=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            stat = self._timers.get(name)
+            if stat is None:
+                stat = self._timers[name] = {'count': 0, 'total_s': 0.0, 'max_s': 0.0, 'rows': 0}
+            stat['count'] += 1
+            stat['total_s'] += seconds
+            stat['max_s'] = max(stat['max_s'], seconds)
+            if rows is not None:
+                stat['rows'] += rows
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timers': {name: dict(stat) for name, stat in self._timers.items()},
+                'counters': dict(self._counters)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def flush(self):
+        """현재 값을 모든 싱크로 내보내는 함수"""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+        return snapshot
+
+    def start_periodic_flush(self, interval=15.0):
+        """interval초마다 flush()를 호출하는 데몬 스레드를 시작하는 함수"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning("metrics flush failed: %s", e)
+
+        thread = threading.Thread(target=loop, name='metrics-flush', daemon=True)
+        thread.start()
+        return thread
+
+
+class InMemorySink:
+    """내보낸 스냅샷을 목록으로 보관하는 싱크 (테스트/디버깅용)"""
+
+    def __init__(self):
+        self.snapshots = []
+
+    def emit(self, snapshot):
+        self.snapshots.append(snapshot)
+
+
+class LoggingSink:
+    """스냅샷을 logging으로 기록하는 싱크"""
+
+    def __init__(self, log=None, level=logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def emit(self, snapshot):
+        for name, stat in sorted(snapshot['timers'].items()):
+            mean = stat['total_s'] / stat['count'] if stat['count'] else 0.0
+            self.log.log(self.level, "%s count=%d mean=%.6fs max=%.6fs rows=%d",
+                         name, stat['count'], mean, stat['max_s'], stat['rows'])
+        for name, value in sorted(snapshot['counters'].items()):
+            self.log.log(self.level, "%s %d", name, value)
+
+
+class PrometheusTextSink:
+    """Prometheus node_exporter textfile 형식으로 파일에 쓰는 싱크"""
+
+    def __init__(self, path, prefix='scoliosis'):
+        self.path = path
+        self.prefix = prefix
+
+    def emit(self, snapshot):
+        lines = []
+        for name, stat in sorted(snapshot['timers'].items()):
+            metric = self._name(name)
+            lines.append(f'# TYPE {metric}_seconds summary')
+            lines.append(f'{metric}_seconds_count {stat["count"]}')
+            lines.append(f'{metric}_seconds_sum {stat["total_s"]:.9f}')
+            lines.append(f'{metric}_seconds_max {stat["max_s"]:.9f}')
+            if stat['rows']:
+                lines.append(f'{metric}_rows_total {stat["rows"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = self._name(name)
+            lines.append(f'# TYPE {metric}_total counter')
+            lines.append(f'{metric}_total {value}')
+
+        # 수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, self.path)
+
+    def _name(self, name):
+        return f"{self.prefix}_{name}".replace('.', '_').replace('-', '_')
+
+
+# 프로세스 전체에서 공유하는 기본 레지스트리 (기본값: 꺼짐)
+metrics = Metrics(enabled=os.environ.get('SCOLIOSIS_METRICS') == '1')
+
+
+def timed(name):
+    """함수 실행 시간과 반환된 행 수(리스트 길이)를 기록하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            rows = len(result) if isinstance(result, list) else None
+            metrics.observe(name, time.perf_counter() - started, rows)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def capture_profile(cpu=True, memory=True, top=20):
+    """with 블록 하나를 cProfile/tracemalloc으로 측정하는 컨텍스트 매니저
+
+    블록이 끝나면 yield한 딕셔너리에 'cpu'(누적 시간 상위 top개 함수 텍스트),
+    'memory_peak_bytes', 'memory_top'(할당 위치 상위 top개)가 채워집니다.
+    """
+    report = {}
+    profiler = cProfile.Profile() if cpu else None
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+            report['cpu'] = stream.getvalue()
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            report['memory_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            report['memory_top'] = [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+            if started_tracing:
+                tracemalloc.stop()
+
+
+def profile_analysis(func, *args, **kwargs):
+    """분석 함수 한 번을 프로파일링하여 (결과, 리포트)를 반환하는 함수"""
+    with capture_profile() as report:
+        result = func(*args, **kwargs)
+    return result, report
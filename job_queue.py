@@ -0,0 +1,229 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from image_processor import _analyze_batch_item, _init_batch_worker, get_analyzer
+
+# 작업 상태
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+FINISHED_STATES = (DONE, FAILED, TIMEOUT)
+
+
+class JobQueueFull(RuntimeError):
+    """대기 중인 작업이 max_pending에 도달하여 새 작업을 받을 수 없음"""
+
+
+def _run_job(analyze, image_store, image_path, args):
+    # 업로드 요청에서 하지 않은 썸네일 생성을 분석과 같은 워커에서 처리
+    if image_store is not None and image_path is not None:
+        image_store.put_thumbnail(image_path, args[0])
+    return analyze(args)
+
+
+class AnalysisJobQueue:
+    """이미지 분석을 백그라운드 워커 풀에서 실행하고 결과를 diagnoses에 저장하는 클래스
+
+    submit()은 작업 ID를 바로 반환하며, status()로 진행 상황과 결과를 확인합니다.
+    한 작업에 여러 분석 종류를 요청하면 같은 이미지의 전처리를 공유하며 동시에 실행합니다.
+    mode='thread'는 공유 ImageProcessor(결과 캐시 포함)를 사용하고 OpenCV가 GIL을 놓으므로
+    병렬로 실행되며, mode='process'는 워커 프로세스마다 ImageProcessor를 만듭니다.
+    image_store가 있으면 image_path(원본의 내용 해시)의 썸네일을 작업 안에서 만들어 저장합니다.
+    """
+
+    def __init__(self, processor, db=None, workers=4, mode='thread', max_pending=32,
+                 timeout=30.0, max_finished=256, image_store=None):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.processor = processor
+        self.db = db
+        self.image_store = image_store
+        self.workers = workers
+        self.max_pending = max_pending
+        # 대기와 실행에 각각 적용하는 제한 시간(초)
+        # 대기 중에 넘긴 작업은 실행하지 않고, 실행 중에 넘긴 작업은 'timeout'으로 표시하고 결과를 저장하지 않음
+        self.timeout = timeout
+        self.max_finished = max_finished
+        self.mode = mode
+        if mode == 'process':
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_batch_worker,
+                initargs=(processor.max_dimension, processor._worker_options())
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self._jobs = OrderedDict()
+        # 워커가 비기를 기다리는 (작업 ID, 분석 인자), 풀에는 빈 워커 수만큼만 넘겨 시작 시각을 정확히 기록
+        self._backlog = deque()
+        self._futures = {}
+        self._running = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kinds, image, user_id=None, image_path=None, content_key=None, options=None):
+        """분석 작업을 등록하고 작업 ID를 반환 (대기 작업이 많으면 JobQueueFull)
+
+        kinds는 분석 종류 하나 또는 목록이며, options는 {분석 종류: {옵션: 값}}입니다.
+        결과는 job['results'][분석 종류]에 {'result', 'score', 'error'}로 저장됩니다.
+        """
+        kinds = (kinds,) if isinstance(kinds, str) else tuple(kinds)
+        for kind in kinds:
+            get_analyzer(kind)
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} analyses already pending")
+            self._pending += 1
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kinds': kinds,
+                'user_id': user_id,
+                'image_path': image_path,
+                'status': QUEUED,
+                'results': None,
+                'error': None,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._backlog.append((job_id, (image, kinds, content_key, options)))
+        self._dispatch()
+        return job_id
+
+    def status(self, job_id):
+        """작업 상태 딕셔너리의 복사본 (없는 작업이면 None)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._check_timeout(job)
+            job = dict(job)
+        # 취소된 작업의 완료 콜백이 잠금을 다시 얻으므로 잠금 밖에서 취소
+        if future is not None:
+            future.cancel()
+        return job
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._backlog.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _dispatch(self):
+        # 빈 워커가 있는 동안 대기 작업을 시작 (대기 중에 제한 시간을 넘긴 작업은 건너뜀)
+        while True:
+            with self._lock:
+                if self._running >= self.workers or not self._backlog:
+                    return
+                job_id, args = self._backlog.popleft()
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                self._check_timeout(job)
+                if job['status'] != QUEUED:
+                    continue
+                self._running += 1
+                job['status'] = RUNNING
+                job['started_at'] = time.time()
+
+            if self.mode == 'process':
+                analyze = _analyze_batch_item
+            else:
+                # 스레드 모드는 공유 ImageProcessor로 분석 (_analyze_batch_item과 같은 인자)
+                analyze = lambda args: self.processor.analyze(*args)
+            future = self._executor.submit(_run_job, analyze, self.image_store, job['image_path'], args)
+            with self._lock:
+                self._futures[job_id] = future
+            future.add_done_callback(lambda future, job_id=job_id: self._finish(job_id, future))
+
+    def _finish(self, job_id, future):
+        try:
+            results = future.result()
+            errors = [item['error'] for item in results.values() if item['error']]
+            # 일부 분석만 실패하면 성공한 결과는 저장하고 실패는 종류별 error로 남김
+            error = errors[0] if len(errors) == len(results) else None
+        except BaseException as e:
+            results = None
+            error = str(e)
+
+        with self._lock:
+            job = self._jobs[job_id]
+            self._futures.pop(job_id, None)
+            self._running -= 1
+            self._pending -= 1
+            self._check_timeout(job)
+            records = []
+            if job['status'] != TIMEOUT:
+                job['results'] = results
+                job['error'] = error
+                if not error and self.db is not None and job['user_id'] is not None:
+                    records = [(kind, item['score']) for kind, item in results.items() if not item['error']]
+                if not records:
+                    job['finished_at'] = time.time()
+                    job['status'] = FAILED if error else DONE
+            self._evict_finished()
+
+        # 결과가 실제로 저장된 뒤에 완료로 표시 (쓰기 지연 모드에서는 쓰기 스레드가 saved를 호출)
+        if records:
+            saved = self._saved_callback(job, len(records))
+            for kind, score in records:
+                try:
+                    self.db.add_diagnosis(job['user_id'], kind, score, job['image_path'], done=saved)
+                except Exception as e:
+                    saved(str(e))
+        self._dispatch()
+
+    def _saved_callback(self, job, count):
+        remaining = [count]
+        errors = []
+
+        def saved(error):
+            with self._lock:
+                remaining[0] -= 1
+                if error:
+                    errors.append(error)
+                if remaining[0] or job['status'] != RUNNING:
+                    return
+                job['finished_at'] = time.time()
+                if errors:
+                    job['status'] = FAILED
+                    job['error'] = f"분석 결과를 저장하지 못했습니다: {errors[0]}"
+                else:
+                    job['status'] = DONE
+        return saved
+
+    def _check_timeout(self, job):
+        # 실행 중에 제한 시간을 넘긴 작업의 future를 반환 (호출자가 잠금 밖에서 취소)
+        if job['status'] in FINISHED_STATES or self.timeout is None:
+            return None
+        now = time.time()
+        if job['status'] == QUEUED:
+            if now - job['submitted_at'] > self.timeout:
+                # 아직 시작하지 않은 작업은 실행하지 않고 대기 자리를 반환
+                job['status'] = TIMEOUT
+                job['error'] = f"분석 대기 시간이 {self.timeout:.0f}초를 초과했습니다."
+                job['finished_at'] = now
+                self._pending -= 1
+            return None
+        if now - job['started_at'] > self.timeout:
+            job['status'] = TIMEOUT
+            job['error'] = f"분석 시간이 {self.timeout:.0f}초를 초과했습니다."
+            job['finished_at'] = now
+            # 풀에서 아직 시작하지 않았으면 취소되고, 이미 실행 중이면 끝난 뒤 결과를 버림
+            return self._futures.get(job['id'])
+        return None
+
+    def _evict_finished(self):
+        # 완료된 작업은 최근 max_finished개만 보관
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
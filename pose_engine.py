@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import cv2
+import numpy as np
+
+from instrumentation import metrics
+
+try:
+    import mediapipe as mp
+except ImportError:  # mediapipe가 없으면 랜드마크 엔진을 사용할 수 없음
+    mp = None
+
+# MediaPipe Pose 랜드마크 번호
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def is_available():
+    return mp is not None
+
+
+def get_pose_engine():
+    """프로세스당 하나만 생성되고 워밍업된 PoseEngine을 반환하는 함수"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = PoseEngine()
+                engine.warm_up()
+                _engine = engine
+    return _engine
+
+
+class PoseEngine:
+    """MediaPipe Pose 랜드마크로 어깨/골반/척추 정렬 지표를 계산하는 클래스
+
+    MediaPipe 그래프는 스레드 안전하지 않으므로 모든 추론을 하나의 전용 스레드에서
+    순서대로 실행합니다. 이 덕분에 호출자는 제한 시간을 두고 결과를 기다릴 수 있습니다.
+    한 번에 하나의 추론만 맡으므로 시간을 넘긴 추론이 뒤 요청을 밀리게 하지 않습니다.
+    """
+
+    def __init__(self, model_complexity=1, min_detection_confidence=0.5):
+        if mp is None:
+            raise RuntimeError("mediapipe is not installed")
+        self._pose = mp.solutions.pose.Pose(
+            static_image_mode=True,
+            model_complexity=model_complexity,
+            min_detection_confidence=min_detection_confidence
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pose')
+        # 실행 중이거나 대기 중인 추론 (추론이 끝나거나 취소되면 반환)
+        self._slot = threading.Semaphore(1)
+
+    def warm_up(self):
+        """첫 요청의 모델 초기화 지연을 없애기 위해 빈 이미지로 한 번 추론"""
+        self._infer(np.zeros((256, 256, 3), np.uint8))
+
+    def analyze(self, rgb_image, deadline=None):
+        """RGB 이미지에서 자세 지표를 계산하는 함수
+
+        deadline(초)을 넘기거나, deadline이 있는데 이전 추론이 아직 실행 중이면
+        기다리지 않고 바로 TimeoutError를 발생시킵니다.
+        사람이 검출되지 않으면 None을 반환합니다.
+        """
+        if not self._slot.acquire(blocking=deadline is None):
+            metrics.increment('pose.busy')
+            raise TimeoutError("pose engine is busy")
+        try:
+            future = self._executor.submit(self._infer, rgb_image)
+        except Exception:
+            self._slot.release()
+            raise
+        future.add_done_callback(lambda future: self._slot.release())
+        try:
+            with metrics.timer('pose.inference'):
+                landmarks = future.result(timeout=deadline)
+        except TimeoutError:
+            # 아직 시작하지 않은 추론은 취소하고, 실행 중이면 끝날 때까지 새 추론을 받지 않음
+            future.cancel()
+            metrics.increment('pose.deadline_exceeded')
+            raise
+        if landmarks is None:
+            return None
+        return self._posture_from_landmarks(landmarks)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._pose.close()
+
+    def _infer(self, rgb_image):
+        results = self._pose.process(rgb_image)
+        if results.pose_landmarks is None:
+            return None
+        return results.pose_landmarks.landmark
+
+    def _posture_from_landmarks(self, landmarks):
+        def point(index):
+            return np.array([landmarks[index].x, landmarks[index].y])
+
+        left_shoulder, right_shoulder = point(LEFT_SHOULDER), point(RIGHT_SHOULDER)
+        left_hip, right_hip = point(LEFT_HIP), point(RIGHT_HIP)
+        shoulder_center = (left_shoulder + right_shoulder) / 2
+        hip_center = (left_hip + right_hip) / 2
+
+        # 몸통 길이(어깨 중심~골반 중심)로 정규화하여 촬영 거리와 무관하게 만듦
+        torso = np.linalg.norm(shoulder_center - hip_center)
+        if torso == 0:
+            return None
+
+        shoulder_diff = abs(left_shoulder[1] - right_shoulder[1]) / torso
+        hip_diff = abs(left_hip[1] - right_hip[1]) / torso
+        # 어깨 중심과 골반 중심의 수평 어긋남 (수직에서 벗어난 정도)
+        spine_alignment = abs(shoulder_center[0] - hip_center[0]) / torso
+
+        return {
+            'shoulder_difference': min(float(shoulder_diff), 1.0),
+            'hip_difference': min(float(hip_diff), 1.0),
+            'spine_alignment': min(float(spine_alignment), 1.0)
+        }
+
+
+def to_rgb(image):
+    """PIL 이미지 또는 BGR/그레이스케일 배열을 RGB 배열로 변환하는 함수"""
+    if not isinstance(image, np.ndarray):
+        return np.array(image.convert('RGB'))
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGB)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def warm_up_in_background():
+    """앱 시작 시 첫 요청을 막지 않도록 별도 스레드에서 모델을 생성하고 워밍업하는 함수"""
+    if not is_available():
+        return None
+    thread = threading.Thread(target=get_pose_engine, name='pose-warm-up', daemon=True)
+    thread.start()
+    return thread
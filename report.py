@@ -0,0 +1,332 @@
+import argparse
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from database import Database, series_bucket
+from image_processor import analyzer_label
+from instrumentation import metrics
+from result_cache import content_hash
+
+# 레이아웃을 바꾸면 올려서 이전에 캐시된 리포트를 무효화
+REPORT_VERSION = 1
+# A4 (150dpi)
+PAGE_SIZE = (1240, 1754)
+RESOLUTION = 150
+MARGIN = 90
+# 상세 기록에 포함할 최근 진단 수와 한 페이지의 행 수
+REPORT_MAX_ROWS = 200
+ROWS_PER_PAGE = 48
+# 차트에 그릴 최대 점 수 (넘으면 일/주/월 단위로 집계)
+CHART_MAX_POINTS = 500
+CHART_SIZE = (PAGE_SIZE[0] - 2 * MARGIN, 560)
+CHART_COLORS = ((31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40))
+
+# 한글 글꼴 후보 (SCOLIOSIS_REPORT_FONT로 지정 가능, 없으면 한글이 표시되지 않는 기본 글꼴 사용)
+FONT_PATHS = (
+    '/usr/share/fonts/truetype/nanum/NanumGothic.ttf',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/System/Library/Fonts/AppleSDGothicNeo.ttc',
+    'C:/Windows/Fonts/malgun.ttf',
+)
+
+
+def find_font():
+    """리포트에 사용할 한글 글꼴 경로 (찾지 못하면 None)"""
+    candidates = (os.environ.get('SCOLIOSIS_REPORT_FONT'),) + FONT_PATHS
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+@lru_cache(maxsize=None)
+def _font(size, path=None):
+    if path:
+        return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size=size)
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value)
+
+
+def render_chart(series, font_path=None, size=CHART_SIZE):
+    """diagnosis_series 행 목록을 검사 종류별 꺾은선 차트 PNG 바이트로 그리는 함수"""
+    width, height = size
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    font = _font(18, font_path)
+    left, top, right, bottom = 80, 50, width - 20, height - 50
+
+    lines = {}
+    for period, test_type, _, value, _, _ in series:
+        lines.setdefault(test_type, []).append((_parse_time(period).timestamp(), value))
+    times = [t for points in lines.values() for t, _ in points]
+    values = [v for points in lines.values() for _, v in points]
+    draw.rectangle((left, top, right, bottom), outline=(180, 180, 180))
+    if not values:
+        return _png(image)
+
+    t0, t1 = min(times), max(times)
+    v0, v1 = min(values), max(values)
+    padding = (v1 - v0) * 0.1 or abs(v1) * 0.1 or 1.0
+    v0, v1 = v0 - padding, v1 + padding
+
+    def x(t):
+        return left + (right - left) * ((t - t0) / (t1 - t0) if t1 > t0 else 0.5)
+
+    def y(v):
+        return bottom - (bottom - top) * (v - v0) / (v1 - v0)
+
+    # 눈금과 격자 (범위가 좁으면 소수점 자리를 늘려 눈금 값이 겹치지 않게 함)
+    digits = max(2, 1 - math.floor(math.log10(v1 - v0)))
+    for i in range(5):
+        value = v0 + (v1 - v0) * i / 4
+        draw.line((left, y(value), right, y(value)), fill=(235, 235, 235))
+        draw.text((left - 8, y(value)), f"{value:.{digits}f}", fill='black', font=font, anchor='rm')
+    for i, anchor in enumerate(('la', 'ma', 'ra')):
+        t = t0 + (t1 - t0) * i / 2
+        draw.text((x(t), bottom + 10), datetime.fromtimestamp(t).strftime('%Y-%m-%d'),
+                  fill='black', font=font, anchor=anchor)
+
+    # 검사 종류별 선과 범례
+    for index, (test_type, points) in enumerate(sorted(lines.items())):
+        color = CHART_COLORS[index % len(CHART_COLORS)]
+        xy = [(x(t), y(v)) for t, v in points]
+        if len(xy) > 1:
+            draw.line(xy, fill=color, width=3)
+        for px, py in xy if len(xy) <= 60 else ():
+            draw.ellipse((px - 3, py - 3, px + 3, py + 3), fill=color)
+        legend_x = left + 10 + index * 260
+        draw.rectangle((legend_x, 15, legend_x + 24, 30), fill=color)
+        draw.text((legend_x + 32, 22), analyzer_label(test_type),
+                  fill='black', font=font, anchor='lm')
+    return _png(image)
+
+
+class ReportEngine:
+    """사용자별 진단 기록 PDF 리포트를 만드는 클래스
+
+    차트 이미지, 상세 기록 페이지, 완성된 PDF를 데이터 지문(fingerprint)으로 cache_dir에 저장하므로
+    데이터가 바뀌지 않았다면 다시 만들 때 파일을 읽기만 합니다.
+    지문은 추이 요약 테이블과 사용자 정보로 계산하므로 진단 기록 전체를 읽지 않습니다.
+    """
+
+    def __init__(self, db, cache_dir='report_cache', font_path=None):
+        self.db = db
+        self.cache_dir = cache_dir
+        self.font_path = font_path or find_font()
+
+    def fingerprint(self, user_id):
+        """리포트 내용에 영향을 주는 데이터의 해시 (진단이 추가되면 추이 요약이 바뀌므로 달라짐)"""
+        return self._fingerprint(self.db.get_user(user_id), self.db.get_trends(user_id))
+
+    def _fingerprint(self, user, trends):
+        return content_hash(repr((REPORT_VERSION, user, trends)).encode('utf-8'))
+
+    def _cache_path(self, kind, key, extension):
+        return os.path.join(self.cache_dir, kind, f"{key}.{extension}")
+
+    def _cached(self, kind, key, extension, build):
+        # kind/key 파일이 있으면 읽고, 없으면 build()로 만들어 원자적으로 저장
+        path = self._cache_path(kind, key, extension)
+        if os.path.exists(path):
+            metrics.increment(f'report.{kind}_cache_hit')
+            with open(path, 'rb') as f:
+                return f.read()
+        data = build()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return data
+
+    def render_file(self, user_id):
+        """리포트 PDF 파일 경로와 캐시 사용 여부를 반환하는 함수"""
+        user = self.db.get_user(user_id)
+        if user is None:
+            raise ValueError(f"Unknown user: {user_id}")
+        trends = self.db.get_trends(user_id)
+        key = self._fingerprint(user, trends)
+        path = self._cache_path('pdf', key, 'pdf')
+        cached = os.path.exists(path)
+        if not cached:
+            with metrics.timer('report.render'):
+                self._cached('pdf', key, 'pdf', lambda: self._build(user, trends))
+        return path, cached
+
+    def render(self, user_id):
+        """리포트 PDF 바이트"""
+        path, _ = self.render_file(user_id)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _build(self, user, trends):
+        pages = [self._summary_page(user, trends)] + self._history_pages(user[0], trends)
+        output = io.BytesIO()
+        pages[0].save(output, 'PDF', resolution=RESOLUTION, save_all=True, append_images=pages[1:],
+                      title=f"{user[1]} 진단 리포트", quality=90)
+        return output.getvalue()
+
+    def _summary_page(self, user, trends):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        title, body = _font(44, self.font_path), _font(24, self.font_path)
+
+        y = MARGIN
+        draw.text((MARGIN, y), "척추측만증 자가진단 리포트", fill='black', font=title)
+        y += 80
+        draw.text((MARGIN, y), f"이름: {user[1]}    나이: {user[2]}    성별: {user[3]}", fill='black', font=body)
+        y += 40
+        # 캐시된 리포트도 내용이 같도록 작성 시각 대신 마지막 진단 날짜를 표시
+        latest = max((trend['last_at'][:10] for trend in trends), default='-')
+        draw.text((MARGIN, y), f"척추측만증 형태: {user[6] or '-'}    마지막 진단: {latest}",
+                  fill='black', font=body)
+        y += 70
+
+        if not trends:
+            draw.text((MARGIN, y), "아직 진단 기록이 없습니다.", fill='black', font=body)
+            return page
+
+        for trend in trends:
+            draw.text((MARGIN, y), analyzer_label(trend['test_type']),
+                      fill='black', font=_font(30, self.font_path))
+            y += 45
+            draw.text((MARGIN, y),
+                      f"기록 {trend['samples']}회 ({trend['first_at'][:10]} ~ {trend['last_at'][:10]})    "
+                      f"최근 {trend['last_result']:.2f}    가중 평균 {trend['ewma']:.2f}",
+                      fill='black', font=body)
+            y += 36
+            rate = trend['rate_per_month']
+            draw.text((MARGIN, y),
+                      f"최소 {trend['min_result']:.2f}    최대 {trend['max_result']:.2f}    "
+                      f"30일당 변화 {f'{rate:+.2f}' if rate is not None else '기간 부족'}",
+                      fill='black', font=body)
+            y += 60
+
+        chart = Image.open(io.BytesIO(self._chart(user[0], trends)))
+        page.paste(chart, (MARGIN, y + 20))
+        return page
+
+    def _chart(self, user_id, trends):
+        first_day = min(_parse_time(trend['first_at']) for trend in trends).date()
+        last_day = max(_parse_time(trend['last_at']) for trend in trends).date()
+        bucket = series_bucket(sum(trend['samples'] for trend in trends),
+                               (last_day - first_day).days + 1, CHART_MAX_POINTS)
+        series = self.db.diagnosis_series(user_id, bucket=bucket)
+        key = content_hash(repr((REPORT_VERSION, CHART_SIZE, series)).encode('utf-8'))
+        return self._cached('charts', key, 'png', lambda: render_chart(series, self.font_path))
+
+    def _history_pages(self, user_id, trends):
+        # 상세 기록 페이지는 추이 요약이 같으면 내용도 같으므로 페이지 이미지를 그대로 재사용
+        count = min(sum(trend['samples'] for trend in trends), REPORT_MAX_ROWS)
+        key = content_hash(repr((REPORT_VERSION, user_id, trends)).encode('utf-8'))
+        rows = None
+        pages = []
+        for number, start in enumerate(range(0, count, ROWS_PER_PAGE)):
+            def build():
+                nonlocal rows
+                if rows is None:
+                    rows, _ = self.db.get_user_diagnoses_page(user_id, limit=REPORT_MAX_ROWS)
+                return self._history_page(rows[start:start + ROWS_PER_PAGE], len(rows))
+            pages.append(Image.open(io.BytesIO(self._cached('history', f"{key}-{number}", 'png', build))))
+        return pages
+
+    def _history_page(self, rows, total):
+        header, body = _font(30, self.font_path), _font(22, self.font_path)
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        draw.text((MARGIN, MARGIN), f"상세 기록 (최근 {total}건)", fill='black', font=header)
+        y = MARGIN + 70
+        for column, x in (("날짜", 0), ("검사", 360), ("측정값", 700)):
+            draw.text((MARGIN + x, y), column, fill='black', font=body)
+        y += 40
+        draw.line((MARGIN, y - 6, PAGE_SIZE[0] - MARGIN, y - 6), fill=(120, 120, 120))
+        for row in rows:
+            draw.text((MARGIN, y), row[5], fill='black', font=body)
+            draw.text((MARGIN + 360, y), analyzer_label(row[2]), fill='black', font=body)
+            draw.text((MARGIN + 700, y), f"{row[3]:.4f}", fill='black', font=body)
+            y += 31
+        return _png(page)
+
+
+def _png(image):
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=False)
+    return output.getvalue()
+
+
+# 일괄 생성 워커 프로세스마다 한 번만 만드는 리포트 엔진
+_worker = None
+
+def _init_worker(db_path, cache_dir):
+    global _worker
+    _worker = ReportEngine(Database(db_path), cache_dir)
+
+def _render_report(args):
+    user_id, output_dir = args
+    try:
+        path, cached = _worker.render_file(user_id)
+        destination = os.path.join(output_dir, f"report_{user_id}.pdf")
+        shutil.copyfile(path, destination)
+        return user_id, destination, cached, None
+    except Exception as e:
+        return user_id, None, False, str(e)
+
+
+def generate_reports(db_path, output_dir, user_ids=None, cache_dir='report_cache', workers=None, chunksize=8):
+    """여러 사용자의 리포트를 프로세스 풀에서 만들어 output_dir/report_<ID>.pdf로 저장하는 함수
+
+    (사용자 ID, 경로, 캐시 사용 여부, 오류) 목록과 통계를 반환합니다.
+    """
+    if user_ids is None:
+        with Database(db_path) as db:
+            user_ids = db.get_user_ids()
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    items = [(user_id, output_dir) for user_id in user_ids]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_path, cache_dir)) as executor:
+        results = list(executor.map(_render_report, items, chunksize=chunksize))
+    elapsed = time.perf_counter() - started
+    return results, {
+        'reports': sum(1 for result in results if result[3] is None),
+        'cached': sum(1 for result in results if result[2]),
+        'failed': sum(1 for result in results if result[3] is not None),
+        'elapsed_s': elapsed,
+        'reports_per_sec': len(results) / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="사용자별 진단 리포트 PDF 일괄 생성")
+    parser.add_argument('--db', default='scoliosis.db', help="데이터베이스 경로")
+    parser.add_argument('--output-dir', default='reports', help="리포트를 저장할 디렉터리")
+    parser.add_argument('--cache-dir', default='report_cache', help="차트/페이지/리포트 캐시 디렉터리")
+    parser.add_argument('--user-id', type=int, action='append', help="리포트를 만들 사용자 ID (기본값: 전체)")
+    parser.add_argument('--workers', type=int, default=None, help="워커 프로세스 수 (기본값: CPU 코어 수)")
+    args = parser.parse_args(argv)
+
+    results, stats = generate_reports(args.db, args.output_dir, args.user_id, args.cache_dir, args.workers)
+    for user_id, path, cached, error in results:
+        if error:
+            print(f"{user_id}\tERROR\t{error}", file=sys.stderr)
+    print(f"{stats['reports']}개 생성 (캐시 {stats['cached']}개), {stats['failed']}개 실패, "
+          f"{stats['elapsed_s']:.2f}초 ({stats['reports_per_sec']:.1f} reports/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from database import Database
+from image_processor import ANALYZERS, ImageProcessor, get_analyzer
+from image_store import ImageStore
+
+# 워커 프로세스마다 한 번만 생성되는 분석기와 저장소
+_worker = None
+
+def _init_worker(image_root, max_dimension):
+    global _worker
+    _worker = (ImageProcessor(max_dimension=max_dimension), ImageStore(image_root, max_dimension))
+
+def _rescore(args):
+    kind, diagnosis_id, image_hash = args
+    processor, store = _worker
+    if not store.exists(image_hash):
+        return diagnosis_id, None, 'missing'
+    try:
+        # 작업 해상도 썸네일을 읽으므로 원본을 디코딩하고 축소할 필요가 없음
+        image = store.load(image_hash, thumbnail=True)
+        item = processor._process_one(kind, image)
+        return diagnosis_id, item['score'], item['error']
+    except Exception as e:
+        return diagnosis_id, None, str(e)
+
+
+class Reprocessor:
+    """저장된 이미지로 과거 진단을 현재 알고리즘 버전으로 다시 채점하는 클래스
+
+    결과는 diagnoses.result를 덮어쓰지 않고 diagnosis_results에 분석기 버전(Analyzer.version)별로 저장되며,
+    청크마다 결과와 재개 지점을 한 트랜잭션으로 기록하므로 중단 후 다시 실행하면 이어서 처리합니다.
+    """
+
+    def __init__(self, db, image_root='images', workers=None, chunk_size=256,
+                 max_dimension=1024, algorithm_version=None):
+        self.db = db
+        self.image_root = image_root
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_dimension = max_dimension
+        # 결과와 재개 지점에 기록할 버전 (None이면 검사 종류별 분석기 버전)
+        self.algorithm_version = algorithm_version
+
+    def run(self, kind, restart=False, progress=None):
+        """kind 검사를 재채점하고 처리 통계를 반환하는 함수
+
+        progress가 주어지면 청크마다 누적 통계 딕셔너리로 호출합니다.
+        """
+        version = self.algorithm_version or get_analyzer(kind).version
+
+        after_id = 0 if restart else self.db.get_reprocess_checkpoint(version, kind)
+        stats = {'algorithm_version': version, 'processed': 0, 'rescored': 0, 'missing': 0, 'failed': 0,
+                 'elapsed_s': 0.0, 'images_per_sec': 0.0, 'last_diagnosis_id': after_id}
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.image_root, self.max_dimension)) as executor:
+            while True:
+                rows = self.db.get_reprocess_batch(kind, after_id, self.chunk_size)
+                if not rows:
+                    break
+
+                items = [(kind, diagnosis_id, image_hash) for diagnosis_id, image_hash in rows]
+                results = []
+                for diagnosis_id, score, error in executor.map(_rescore, items, chunksize=8):
+                    if error == 'missing':
+                        stats['missing'] += 1
+                    elif error:
+                        stats['failed'] += 1
+                        results.append((diagnosis_id, None))
+                    else:
+                        stats['rescored'] += 1
+                        results.append((diagnosis_id, score))
+
+                after_id = rows[-1][0]
+                self.db.save_reprocessed_results(version, kind, results, after_id)
+
+                stats['processed'] += len(rows)
+                stats['last_diagnosis_id'] = after_id
+                stats['elapsed_s'] = time.perf_counter() - started
+                stats['images_per_sec'] = stats['processed'] / stats['elapsed_s'] if stats['elapsed_s'] > 0 else 0.0
+                if progress is not None:
+                    progress(dict(stats))
+
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="저장된 이미지로 과거 진단 재채점")
+    parser.add_argument('--kind', choices=list(ANALYZERS), action='append', help="재채점할 검사 (기본값: 전체)")
+    parser.add_argument('--db', default='scoliosis.db', help="데이터베이스 경로")
+    parser.add_argument('--image-root', default='images', help="이미지 저장소 경로")
+    parser.add_argument('--workers', type=int, default=None, help="워커 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument('--chunk-size', type=int, default=256, help="한 트랜잭션에 저장할 진단 수")
+    parser.add_argument('--restart', action='store_true', help="재개 지점을 무시하고 처음부터 다시 처리")
+    args = parser.parse_args(argv)
+
+    def report(stats):
+        print(f"{stats['processed']}개 처리 (마지막 ID {stats['last_diagnosis_id']}), "
+              f"{stats['images_per_sec']:.1f} images/sec", file=sys.stderr)
+
+    with Database(args.db) as db:
+        reprocessor = Reprocessor(db, args.image_root, workers=args.workers, chunk_size=args.chunk_size)
+        for kind in args.kind or list(ANALYZERS):
+            stats = reprocessor.run(kind, restart=args.restart, progress=report)
+            print(f"{kind} v{stats['algorithm_version']}: {stats['rescored']}개 재채점, "
+                  f"{stats['missing']}개 이미지 없음, {stats['failed']}개 실패, "
+                  f"{stats['elapsed_s']:.2f}초 ({stats['images_per_sec']:.1f} images/sec)")
+
+
+if __name__ == "__main__":
+    main()
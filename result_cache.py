@@ -0,0 +1,99 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 캐시에 값이 없음을 나타내는 표시 (None도 유효한 값이 될 수 있으므로 별도 객체 사용)
+MISSING = object()
+
+
+def content_hash(data):
+    """이미지 내용(bytes, numpy 배열, PIL 이미지)의 해시를 계산하는 함수"""
+    hasher = hashlib.blake2b(digest_size=20)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        hasher.update(data)
+        return hasher.hexdigest()
+
+    # 업로드 바이트 해시에는 필요 없으므로 numpy/PIL은 여기서 불러옴
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(data, Image.Image):
+        hasher.update(f"{data.mode}:{data.size}".encode())
+        hasher.update(data.tobytes())
+    else:
+        data = np.asarray(data)
+        hasher.update(f"{data.dtype}:{data.shape}".encode())
+        hasher.update(np.ascontiguousarray(data).data)
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """분석 결과를 위한 LRU 메모리 캐시와 선택적인 SQLite 디스크 캐시"""
+
+    def __init__(self, max_entries=256, disk_path=None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if self._conn is None:
+                return MISSING
+            row = self._conn.execute(
+                'SELECT value FROM analysis_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return MISSING
+            value = json.loads(row[0])
+            self._remember(key, value)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO analysis_cache (key, value, created_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), time.time())
+                )
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM analysis_cache')
+                self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -1,27 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import cv2
-import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-from PIL import Image
 import io
+import time
 
-from database import Database
-from image_processor import ImageProcessor
+# cv2, numpy, PIL, pandas, plotly, mediapipe는 필요한 페이지에서만 불러와 첫 화면 로딩을 줄임
+from database import Database, series_bucket
 from exercise_guide import ExerciseGuide
 
-# 전역 변수 초기화
-if 'db' not in st.session_state:
-    st.session_state.db = Database()
-if 'image_processor' not in st.session_state:
-    st.session_state.image_processor = ImageProcessor()
-if 'exercise_guide' not in st.session_state:
-    st.session_state.exercise_guide = ExerciseGuide()
-if 'user_id' not in st.session_state:
-    st.session_state.user_id = None
-
 # 페이지 설정
 st.set_page_config(
     page_title="척추측만증 자가진단",
@@ -29,14 +15,83 @@ st.set_page_config(
     layout="wide"
 )
 
-def resize_image(image, max_width=800):
-    """이미지 크기를 조정하는 함수"""
-    width, height = image.size
-    if width > max_width:
-        ratio = max_width / width
-        new_height = int(height * ratio)
-        return image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-    return image
+# 프로세스 전체에서 공유하는 리소스 (스키마 초기화와 모델 로딩은 프로세스당 한 번)
+@st.cache_resource
+def setup_metrics():
+    from instrumentation import metrics, LoggingSink, PrometheusTextSink
+
+    # SCOLIOSIS_METRICS=1일 때만 계측하며, SCOLIOSIS_METRICS_FILE이 있으면 Prometheus 텍스트 파일로 내보냄
+    if metrics.enabled:
+        path = os.environ.get('SCOLIOSIS_METRICS_FILE')
+        metrics.add_sink(PrometheusTextSink(path) if path else LoggingSink())
+        metrics.start_periodic_flush()
+    return metrics
+
+@st.cache_resource
+def get_database():
+    return Database(write_behind=True)
+
+@st.cache_resource
+def get_exercise_guide():
+    return ExerciseGuide()
+
+@st.cache_resource
+def get_image_processor():
+    from image_processor import ImageProcessor
+    from result_cache import ResultCache
+    import pose_engine
+
+    # 흐리거나 어두운 사진은 품질 검사에서 바로 거부하여 분석 워커를 점유하지 않음
+    processor = ImageProcessor(
+        cache=ResultCache(disk_path='analysis_cache.db'),
+        pose_deadline=2.0,
+        quality_gate=True
+    )
+    # 포즈 모델은 프로세스당 한 번만 생성되므로 미리 워밍업
+    pose_engine.warm_up_in_background()
+    return processor
+
+@st.cache_resource
+def get_image_store():
+    from image_store import ImageStore
+
+    # 원본과 작업 해상도 썸네일을 내용 해시로 저장 (diagnoses.image_path에는 해시를 기록)
+    return ImageStore('images')
+
+@st.cache_resource
+def get_job_queue():
+    from job_queue import AnalysisJobQueue
+
+    # 여러 사용자의 업로드를 동시에 분석하되, 대기 작업 수와 작업당 시간을 제한
+    # 업로드 썸네일은 요청 처리 중이 아니라 분석 작업 안에서 만듦
+    return AnalysisJobQueue(get_image_processor(), get_database(), workers=4,
+                            max_pending=32, timeout=30.0, image_store=get_image_store())
+
+@st.cache_resource
+def get_report_engine():
+    from report import ReportEngine
+
+    return ReportEngine(get_database(), 'report_cache')
+
+# 전역 변수 초기화
+setup_metrics()
+if 'db' not in st.session_state:
+    st.session_state.db = get_database()
+if 'exercise_guide' not in st.session_state:
+    st.session_state.exercise_guide = get_exercise_guide()
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = None
+
+# 추이 차트에 그대로 그릴 최대 진단 수 (넘으면 일/주/월 단위로 집계)
+CHART_MAX_POINTS = 500
+CHART_BUCKET_LABELS = {'day': " (일별 평균)", 'week': " (주별 평균)", 'month': " (월별 평균)"}
+DIAGNOSIS_PAGE_SIZES = (20, 50, 100)
+
+def preview_image(data, max_dimension=800):
+    """업로드 바이트를 미리보기 크기로 축소 디코딩하는 함수 (BGR 배열)"""
+    from image_processor import decode_image
+
+    return decode_image(data, max_dimension, grayscale=False)
 
 def get_exercise_shorts():
     """운동 관련 쇼츠 영상 정보를 가져오는 함수"""
@@ -138,92 +193,162 @@ def main_dashboard():
     # 오늘의 통계
     col1, col2, col3 = st.columns(3)
     
+    user_id = st.session_state.user_id
+    
     with col1:
-        diagnoses = st.session_state.db.get_user_diagnoses(st.session_state.user_id) if st.session_state.user_id else []
-        today = datetime.now().date()
-        today_diagnoses = len([d for d in diagnoses if datetime.strptime(d[5], '%Y-%m-%d %H:%M:%S').date() == today])
+        today_diagnoses = st.session_state.db.count_diagnoses_on(user_id) if user_id else 0
         st.metric(label="오늘의 진단", value=f"{today_diagnoses}회")
     
     with col2:
-        exercises = st.session_state.db.get_user_exercises(st.session_state.user_id) if st.session_state.user_id else []
-        completed_exercises = len([e for e in exercises if e[3] and datetime.strptime(e[4], '%Y-%m-%d').date() == today])
+        completed_exercises = st.session_state.db.count_completed_exercises_on(user_id) if user_id else 0
         st.metric(label="운동 완료", value=f"{completed_exercises}회")
     
     with col3:
-        if diagnoses:
-            latest_curvature = diagnoses[0][3]
+        latest = st.session_state.db.latest_diagnosis(user_id) if user_id else None
+        if latest:
+            latest_curvature = latest[3]
             progress = min(100, (latest_curvature / 0.5) * 100)
             st.metric(label="진행 상황", value=f"{progress:.1f}%")
         else:
             st.metric(label="진행 상황", value="0%")
+    
+    # 측정값이 빠르게 증가하는 검사가 있으면 경고 (추이 요약 테이블만 읽음)
+    if user_id:
+        from image_processor import ANALYZERS, analyzer_label
+        
+        rates = {name: analyzer.alert_rate for name, analyzer in ANALYZERS.items() if analyzer.alert_rate}
+        for trend in st.session_state.db.get_progression_alerts(user_id, rates=rates):
+            st.warning(f"{analyzer_label(trend['test_type'])} 측정값이 "
+                       f"30일당 {trend['rate_per_month']:+.2f}씩 증가하고 있습니다. 전문의 상담을 권장합니다.")
 
 # 자가진단 페이지
+def show_analysis_job(job_key, failure_message):
+    """세션에 저장된 분석 작업의 상태를 표시하고, 완료된 작업을 반환하는 함수"""
+    job_id = st.session_state.get(job_key)
+    if job_id is None:
+        return None
+    
+    job = get_job_queue().status(job_id)
+    if job is None:
+        del st.session_state[job_key]
+        return None
+    if job['status'] == 'queued':
+        st.info("분석 대기 중입니다...")
+    elif job['status'] == 'running':
+        st.info("이미지를 분석중입니다...")
+    elif job['status'] == 'done':
+        return job
+    elif job['status'] == 'timeout':
+        st.error(job['error'])
+    else:
+        quality = job_quality(job)
+        if quality is not None and quality['status'] == 'reject':
+            # 품질 검사에서 거부된 사진은 다시 촬영할 수 있도록 거부 사유를 표시
+            for reason in quality['reasons']:
+                if reason['severity'] == 'reject':
+                    st.error(reason['message'])
+        else:
+            st.error(failure_message)
+    return None
+
+def job_quality(job):
+    """분석 작업의 품질 검사 결과 (품질 검사를 하지 않았으면 None)"""
+    for item in (job['results'] or {}).values():
+        if item.get('quality') is not None:
+            return item['quality']
+    return None
+
+def show_analysis_result(analyzer, item):
+    """분석기 하나의 결과를 선언된 표시 항목에 따라 그리는 함수"""
+    if item['error']:
+        st.error(f"{analyzer.label} 분석에 실패했습니다: {item['error']}")
+    elif analyzer.fields:
+        st.write(f"{analyzer.label} 결과:")
+        for field, label in analyzer.fields.items():
+            st.write(f"- {label}: {item['result'][field]:.2f}")
+    else:
+        st.write(f"{analyzer.score_label}: {item['score']:.2f}")
+
+def photo_guide(photo, analyzers):
+    """촬영 자세의 (탭 제목, 안내 문구), 안내가 없는 자세는 첫 분석기 이름을 사용"""
+    from image_processor import PHOTO_GUIDES
+    
+    return PHOTO_GUIDES.get(photo, (analyzers[0].label, "분석할 사진을 업로드해주세요."))
+
+def photo_analysis(photo, analyzers, job_queue, image_store):
+    """같은 사진을 쓰는 분석기들을 한 번의 업로드로 함께 실행하는 탭"""
+    from job_queue import JobQueueFull
+    
+    title, guide = photo_guide(photo, analyzers)
+    st.header(title)
+    st.write(guide)
+    uploaded_file = st.file_uploader("사진 업로드", type=['jpg', 'jpeg', 'png'], key=f"{photo}_upload")
+    
+    # 분석기가 선언한 옵션마다 선택 위젯 표시
+    options = {}
+    for analyzer in analyzers:
+        for option, (label, choices) in analyzer.options.items():
+            choice = st.radio(label, list(choices), horizontal=True, key=f"{analyzer.name}_{option}")
+            options.setdefault(analyzer.name, {})[option] = choices[choice]
+    
+    if uploaded_file is not None:
+        # 업로드 바이트를 그대로 분석 작업에 넘기고, 미리보기만 축소 디코딩
+        image = uploaded_file.getvalue()
+        st.image(preview_image(image), caption="업로드된 이미지", channels="BGR", use_container_width=True)
+        
+        if st.button("분석 시작", key=f"{photo}_start"):
+            try:
+                # 원본만 바로 저장하고 (디코딩 없음) 내용 해시를 결과 캐시 키로도 사용
+                image_hash = image_store.put_original(image)
+                st.session_state[f"{photo}_job"] = job_queue.submit(
+                    [analyzer.name for analyzer in analyzers], image,
+                    user_id=st.session_state.user_id,
+                    image_path=image_hash,
+                    content_key=image_hash,
+                    options=options
+                )
+            except JobQueueFull:
+                st.warning("분석 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+        
+        job = show_analysis_job(f"{photo}_job", "이미지 분석에 실패했습니다. 다시 시도해주세요.")
+        if job is not None:
+            st.success("분석 완료!")
+            quality = job_quality(job)
+            for reason in (quality['reasons'] if quality else ()):
+                st.warning(reason['message'])
+            for analyzer in analyzers:
+                show_analysis_result(analyzer, job['results'][analyzer.name])
+
 def self_diagnosis():
     st.title("자가진단")
+    from image_processor import ANALYZERS
     
-    tab1, tab2 = st.tabs(["아담스 테스트", "기본 자세 체크"])
+    job_queue = get_job_queue()
+    image_store = get_image_store()
     
-    with tab1:
-        st.header("아담스 테스트")
-        st.write("앞으로 굽혀서 등 사진을 업로드해주세요.")
-        uploaded_file = st.file_uploader("사진 업로드", type=['jpg', 'jpeg', 'png'])
-        
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            resized_image = resize_image(image)
-            st.image(resized_image, caption="업로드된 이미지", use_container_width=True)
-            
-            if st.button("분석 시작"):
-                with st.spinner("이미지를 분석중입니다..."):
-                    curvature = st.session_state.image_processor.process_adams_test(image)
-                    if curvature is not None:
-                        st.success(f"분석 완료! 척추 곡률: {curvature:.2f}")
-                        st.session_state.db.add_diagnosis(
-                            st.session_state.user_id,
-                            "adams_test",
-                            curvature,
-                            uploaded_file.name
-                        )
-                    else:
-                        st.error("이미지 분석에 실패했습니다. 다시 시도해주세요.")
+    # 등록된 분석기를 촬영 자세별로 묶어 탭 하나에 표시
+    photos = {}
+    for analyzer in ANALYZERS.values():
+        photos.setdefault(analyzer.photo, []).append(analyzer)
     
-    with tab2:
-        st.header("기본 자세 체크")
-        st.write("기본 자세 체크를 위한 사진을 업로드해주세요.")
-        uploaded_file = st.file_uploader("기본 자세 사진 업로드", type=['jpg', 'jpeg', 'png'])
-        
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            resized_image = resize_image(image)
-            st.image(resized_image, caption="업로드된 이미지", use_container_width=True)
-            
-            if st.button("자세 분석 시작"):
-                with st.spinner("자세를 분석중입니다..."):
-                    posture_data = st.session_state.image_processor.process_posture(image)
-                    if posture_data:
-                        st.success("분석 완료!")
-                        st.write("분석 결과:")
-                        st.write(f"- 어깨 높이 차이: {posture_data['shoulder_difference']:.2f}")
-                        st.write(f"- 골반 기울기: {posture_data['hip_difference']:.2f}")
-                        st.write(f"- 척추 정렬: {posture_data['spine_alignment']:.2f}")
-                        
-                        # 결과 저장
-                        result = (posture_data['shoulder_difference'] + 
-                                posture_data['hip_difference'] + 
-                                posture_data['spine_alignment']) / 3
-                        st.session_state.db.add_diagnosis(
-                            st.session_state.user_id,
-                            "posture_check",
-                            result,
-                            uploaded_file.name
-                        )
-                    else:
-                        st.error("자세 분석에 실패했습니다. 다시 시도해주세요.")
+    tabs = st.tabs([photo_guide(photo, analyzers)[0] for photo, analyzers in photos.items()])
+    for tab, (photo, analyzers) in zip(tabs, photos.items()):
+        with tab:
+            photo_analysis(photo, analyzers, job_queue, image_store)
+    
+    # 진행 중인 작업이 있으면 잠시 후 다시 그려 상태를 갱신
+    for photo in photos:
+        job_key = f"{photo}_job"
+        job = job_queue.status(st.session_state[job_key]) if job_key in st.session_state else None
+        if job is not None and job['status'] in ('queued', 'running'):
+            time.sleep(0.5)
+            st.rerun()
 
 # 운동 가이드 페이지
 def exercise_guide():
     st.title("운동 가이드")
     
+    user = None
     if st.session_state.user_id:
         user = st.session_state.db.get_user(st.session_state.user_id)
         if user and user[6]:  # scoliosis_type이 있는 경우
@@ -236,16 +361,21 @@ def exercise_guide():
                 st.write("복합형 척추측만증에 맞는 운동을 추천해드립니다.")
     
     # 최근 진단 결과 가져오기
-    diagnoses = st.session_state.db.get_user_diagnoses(st.session_state.user_id) if st.session_state.user_id else []
-    if diagnoses:
-        latest_curvature = diagnoses[0][3]
+    latest = st.session_state.db.latest_diagnosis(st.session_state.user_id) if st.session_state.user_id else None
+    if latest:
+        latest_curvature = latest[3]
         st.write(f"최근 진단 결과에 따른 맞춤 운동을 추천해드립니다.")
         
-        # 운동 프로그램 가져오기
-        program = st.session_state.exercise_guide.get_exercise_program(latest_curvature, "30분")
+        # 운동 프로그램 가져오기 (척추측만증 형태와 최근 7일 운동 기록 반영)
+        duration = st.selectbox("운동 시간", ["10분", "20분", "30분", "45분"], index=2)
+        recent = st.session_state.db.recent_completed_exercises(st.session_state.user_id)
+        program = st.session_state.exercise_guide.get_exercise_program(
+            latest_curvature, duration, scoliosis_type=user[6] if user else None, recent_exercises=recent
+        )
         
         # 운동 프로그램 표시
         st.subheader("맞춤 운동 프로그램")
+        st.caption(f"총 {sum(exercise['total_minutes'] for exercise in program)}분")
         for exercise in program:
             with st.expander(f"{exercise['name']} ({exercise['difficulty']})"):
                 st.write(f"**설명:** {exercise['description']}")
@@ -294,36 +424,101 @@ def exercise_guide():
 # 기록 관리 페이지
 def record_management():
     st.title("진단 기록 관리")
+    import pandas as pd
+    import plotly.express as px
+    from image_processor import analyzer_label
     
     if st.session_state.user_id:
-        # 진단 기록 가져오기
-        diagnoses = st.session_state.db.get_user_diagnoses(st.session_state.user_id)
-        if diagnoses:
+        # 재분석 결과가 있으면 표시할 알고리즘 버전 선택
+        versions = st.session_state.db.get_algorithm_versions(st.session_state.user_id)
+        algorithm_version = None
+        if versions:
+            labels = {"원본": None}
+            labels.update({f"v{version}": version for version in versions})
+            algorithm_version = labels[st.selectbox("분석 알고리즘 버전", list(labels))]
+        
+        # 검사 종류별 추이 요약 (진단이 추가될 때마다 갱신되는 요약 테이블)
+        trends = st.session_state.db.get_trends(st.session_state.user_id)
+        for trend in trends:
+            st.subheader(f"{analyzer_label(trend['test_type'])} 추이")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("최근 측정값", f"{trend['last_result']:.2f}")
+            col2.metric("가중 평균", f"{trend['ewma']:.2f}")
+            col3.metric("최소 / 최대", f"{trend['min_result']:.2f} / {trend['max_result']:.2f}")
+            # 기록 기간이 짧으면 변화율을 계산하지 않음
+            rate = trend['rate_per_month']
+            col4.metric("30일당 변화", f"{rate:+.2f}" if rate is not None else "기간 부족")
+        
+        if trends:
+            # 조회 기간에 따라 원본 또는 일/주/월 단위 집계로 차트 점의 수를 제한
+            ranges = {"최근 30일": 30, "최근 90일": 90, "최근 1년": 365, "전체": None}
+            days = ranges[st.radio("조회 기간", list(ranges), index=3, horizontal=True)]
+            end_day = datetime.now().date()
+            start_day = end_day - timedelta(days=days - 1) if days else None
+            first_day = min(datetime.strptime(trend['first_at'][:10], '%Y-%m-%d').date() for trend in trends)
+            bucket = chart_bucket(st.session_state.user_id, start_day, end_day, first_day)
+            series = st.session_state.db.diagnosis_series(
+                st.session_state.user_id, start_day, end_day, bucket, algorithm_version
+            )
+            
             # 데이터프레임 생성
-            df = pd.DataFrame(diagnoses, columns=['id', 'user_id', 'test_type', 'result', 'image_path', 'created_at'])
+            df = pd.DataFrame(series, columns=['created_at', 'test_type', 'count', 'result', 'min', 'max'])
             
             # 날짜 형식 변환
             df['created_at'] = pd.to_datetime(df['created_at'])
             
             # 그래프 생성
-            fig = px.line(df, x='created_at', y='result', 
-                         title='진단 결과 추이',
-                         labels={'result': '측정값', 'created_at': '날짜'})
+            fig = px.line(df, x='created_at', y='result', color='test_type',
+                         title=f"진단 결과 추이{CHART_BUCKET_LABELS.get(bucket, '')}",
+                         hover_data=['count', 'min', 'max'],
+                         labels={'result': '측정값', 'created_at': '날짜', 'test_type': '검사 종류'})
             st.plotly_chart(fig, use_container_width=True)
             
-            # 데이터 테이블 표시
+            # 데이터 테이블 표시 (키셋 커서로 한 페이지씩 조회)
             st.write("상세 기록")
-            st.dataframe(df)
+            show_diagnosis_page(st.session_state.user_id, algorithm_version,
+                                sum(trend['samples'] for trend in trends))
             
-            # PDF 리포트 생성 버튼
+            # PDF 리포트 생성 버튼 (데이터가 바뀌지 않았으면 캐시된 리포트를 그대로 사용)
             if st.button("PDF 리포트 생성"):
-                # PDF 생성 로직 추가 예정
-                st.info("PDF 리포트 생성 기능은 추후 업데이트될 예정입니다.")
+                with st.spinner("리포트를 만드는 중입니다..."):
+                    report = get_report_engine().render(st.session_state.user_id)
+                st.download_button("PDF 리포트 다운로드", report,
+                                   file_name=f"scoliosis_report_{st.session_state.user_id}.pdf",
+                                   mime="application/pdf")
         else:
             st.write("아직 진단 기록이 없습니다.")
     else:
         st.write("로그인이 필요합니다.")
 
+def chart_bucket(user_id, start_day, end_day, first_day):
+    """조회 기간의 진단 수와 길이로 차트 집계 단위를 고르는 함수 (None이면 원본 그대로)"""
+    count = st.session_state.db.count_diagnoses_between(user_id, start_day, end_day)
+    return series_bucket(count, (end_day - (start_day or first_day)).days + 1, CHART_MAX_POINTS)
+
+def show_diagnosis_page(user_id, algorithm_version, total):
+    """진단 기록을 한 페이지씩 표시하는 함수 (지나온 페이지의 커서는 세션에 보관)"""
+    import pandas as pd
+    
+    page_size = st.selectbox("페이지당 행 수", DIAGNOSIS_PAGE_SIZES, index=1)
+    # 조회 조건이 바뀌면 첫 페이지부터 다시 표시
+    page_key = (user_id, algorithm_version, page_size)
+    if st.session_state.get('diagnosis_page_key') != page_key:
+        st.session_state.diagnosis_page_key = page_key
+        st.session_state.diagnosis_cursors = [None]
+    cursors = st.session_state.diagnosis_cursors
+    
+    rows, next_cursor = st.session_state.db.get_user_diagnoses_page(
+        user_id, cursors[-1], page_size, algorithm_version
+    )
+    st.dataframe(pd.DataFrame(rows, columns=['id', 'user_id', 'test_type', 'result', 'image_path', 'created_at']),
+                 hide_index=True)
+    
+    col1, col2, col3 = st.columns(3)
+    col2.write(f"{len(cursors)} / {max(1, -(-total // page_size))} 페이지")
+    col1.button("이전", disabled=len(cursors) == 1, on_click=cursors.pop)
+    col3.button("다음", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
+
 # 설정 페이지
 def settings():
     st.title("설정")
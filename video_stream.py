@@ -0,0 +1,144 @@
+import argparse
+import json
+import sys
+import time
+
+import cv2
+
+from image_processor import ImageProcessor
+
+POSTURE_METRICS = ('shoulder_difference', 'hip_difference', 'spine_alignment')
+
+
+class PostureStream:
+    """동영상 파일이나 카메라에서 프레임을 읽어 자세 지표를 연속으로 계산하는 클래스
+
+    반복하면 처리한 프레임마다 원본 지표, 지수이동평균으로 평활화한 지표,
+    처리 지연 시간과 누적 드롭 프레임 수를 담은 딕셔너리를 생성합니다.
+    목표 FPS에 맞추느라 건너뛴 프레임은 frames_skipped, 처리가 밀려 버린 프레임은 frames_dropped로 셉니다.
+    """
+
+    def __init__(self, source, processor=None, target_fps=10.0, smoothing=0.3, realtime=None):
+        # source: 동영상 파일 경로 또는 카메라 장치 번호
+        self.source = source
+        self.processor = processor or ImageProcessor()
+        self.target_fps = target_fps
+        # 지수이동평균 가중치 (1에 가까울수록 최신 프레임 비중이 큼)
+        self.smoothing = smoothing
+        # 실시간 모드는 처리 속도에 맞춰 프레임을 버리고,
+        # 파일 모드는 영상의 타임스탬프만 기준으로 건너뛰어 결과가 재현 가능
+        self.realtime = isinstance(source, int) if realtime is None else realtime
+        self.stats = {
+            'frames_read': 0,
+            'frames_processed': 0,
+            'frames_skipped': 0,
+            'frames_dropped': 0,
+            'mean_latency_ms': 0.0,
+            'max_latency_ms': 0.0
+        }
+
+    def __iter__(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise ValueError(f"Cannot open video source: {self.source}")
+
+        source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        if source_fps <= 0:
+            source_fps = self.target_fps
+        # 목표 FPS를 맞추기 위해 처리 사이에 건너뛸 원본 프레임 간격
+        frame_step = max(1.0, source_fps / self.target_fps)
+        frame_budget = 1.0 / self.target_fps
+
+        # 프레임 간에 재사용하는 버퍼
+        frame = None
+        smoothed = None
+        total_latency = 0.0
+        frame_index = -1
+        next_index = 0.0
+        pending_drop = 0
+
+        try:
+            while True:
+                frame_index += 1
+                # 건너뛸 프레임은 디코딩 없이 grab만 수행
+                if frame_index < int(next_index) or pending_drop > 0:
+                    if not capture.grab():
+                        break
+                    self.stats['frames_read'] += 1
+                    if frame_index < int(next_index):
+                        self.stats['frames_skipped'] += 1
+                    else:
+                        # 처리할 차례였지만 앞 프레임 처리가 밀려 버린 프레임
+                        self.stats['frames_dropped'] += 1
+                        next_index += frame_step
+                    pending_drop = max(0, pending_drop - 1)
+                    continue
+
+                ok, frame = capture.read(frame)
+                if not ok:
+                    break
+                self.stats['frames_read'] += 1
+
+                started = time.perf_counter()
+                # 같은 버퍼를 재사용하므로 이전 프레임의 전처리 캐시를 비움
+                self.processor.clear_cache()
+                # 설정된 분석 엔진과 결과 캐시를 쓰도록 컬러 프레임을 그대로 전달
+                posture = self.processor.process_posture(frame)
+                latency = time.perf_counter() - started
+
+                smoothed = self._smooth(smoothed, posture)
+                total_latency += latency
+                self.stats['frames_processed'] += 1
+                self.stats['mean_latency_ms'] = total_latency / self.stats['frames_processed'] * 1000
+                self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], latency * 1000)
+
+                next_index += frame_step
+                if self.realtime and latency > frame_budget:
+                    # 처리 시간이 예산을 넘으면 밀린 만큼 프레임을 버려 목표 FPS 유지
+                    pending_drop = int(latency * source_fps)
+
+                yield {
+                    'frame_index': frame_index,
+                    'timestamp': frame_index / source_fps,
+                    'raw': posture,
+                    'smoothed': dict(smoothed) if smoothed else None,
+                    'latency_ms': latency * 1000,
+                    'skipped_frames': self.stats['frames_skipped'],
+                    'dropped_frames': self.stats['frames_dropped']
+                }
+        finally:
+            capture.release()
+
+    def _smooth(self, smoothed, posture):
+        if posture is None:
+            return smoothed
+        if smoothed is None:
+            return {name: float(posture[name]) for name in POSTURE_METRICS}
+        alpha = self.smoothing
+        return {
+            name: alpha * float(posture[name]) + (1 - alpha) * smoothed[name]
+            for name in POSTURE_METRICS
+        }
+
+
+def stream_posture(source, **kwargs):
+    """PostureStream을 생성하여 프레임별 결과를 차례로 반환하는 제너레이터"""
+    yield from PostureStream(source, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="동영상/카메라 자세 분석")
+    parser.add_argument('source', help="동영상 파일 경로 또는 카메라 장치 번호")
+    parser.add_argument('--fps', type=float, default=10.0, help="목표 처리 FPS")
+    parser.add_argument('--smoothing', type=float, default=0.3, help="지수이동평균 가중치")
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    stream = PostureStream(source, target_fps=args.fps, smoothing=args.smoothing)
+    for sample in stream:
+        print(json.dumps(sample, default=float))
+    print(json.dumps(stream.stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()